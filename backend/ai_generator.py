@@ -1,155 +1,334 @@
-import anthropic
-from typing import List, Optional, Dict, Any
-
-class AIGenerator:
-    """Handles interactions with Anthropic's Claude API for generating responses"""
-    
-    MAX_TOOL_ROUNDS = 2
-
-    # Static system prompt to avoid rebuilding on each call
-    SYSTEM_PROMPT = """ You are an AI assistant specialized in course materials and educational content with access to a comprehensive search tool for course information.
-
-Tool Usage:
-- Use the **search_course_content** tool for questions about specific course content or detailed educational materials
-- Use the **get_course_outline** tool for questions about course structure, syllabus, outline, or lesson listings
-  - When presenting outline results, always include: the course title, the course link, and for each lesson its number and title
-- You may use up to 2 sequential tool calls per query when needed (e.g., first get an outline, then search based on results)
-- Most questions require only one tool call
-- Synthesize tool results into accurate, fact-based responses
-- If a tool yields no results, state this clearly without offering alternatives
-
-Response Protocol:
-- **General knowledge questions**: Answer using existing knowledge without searching
-- **Course outline/structure questions**: Use get_course_outline, then present the full outline with course title, course link, and all lessons
-- **Course content questions**: Use search_course_content, then answer
-- **No meta-commentary**:
- - Provide direct answers only — no reasoning process, search explanations, or question-type analysis
- - Do not mention "based on the search results" or "based on the tool results"
-
-
-All responses must be:
-1. **Brief, Concise and focused** - Get to the point quickly
-2. **Educational** - Maintain instructional value
-3. **Clear** - Use accessible language
-4. **Example-supported** - Include relevant examples when they aid understanding
-Provide only the direct answer to what was asked.
-"""
-    
-    def __init__(self, api_key: str, model: str):
-        self.client = anthropic.Anthropic(api_key=api_key)
-        self.model = model
-        
-        # Pre-build base API parameters
-        self.base_params = {
-            "model": self.model,
-            "temperature": 0,
-            "max_tokens": 800
-        }
-    
-    def generate_response(self, query: str,
-                         conversation_history: Optional[str] = None,
-                         tools: Optional[List] = None,
-                         tool_manager=None) -> str:
-        """
-        Generate AI response with optional tool usage and conversation context.
-        
-        Args:
-            query: The user's question or request
-            conversation_history: Previous messages for context
-            tools: Available tools the AI can use
-            tool_manager: Manager to execute tools
-            
-        Returns:
-            Generated response as string
-        """
-        
-        # Build system content efficiently - avoid string ops when possible
-        system_content = (
-            f"{self.SYSTEM_PROMPT}\n\nPrevious conversation:\n{conversation_history}"
-            if conversation_history 
-            else self.SYSTEM_PROMPT
-        )
-        
-        # Prepare API call parameters efficiently
-        api_params = {
-            **self.base_params,
-            "messages": [{"role": "user", "content": query}],
-            "system": system_content
-        }
-        
-        # Add tools if available
-        if tools:
-            api_params["tools"] = tools
-            api_params["tool_choice"] = {"type": "auto"}
-        
-        # Get response from Claude
-        response = self.client.messages.create(**api_params)
-        
-        # Handle tool execution if needed
-        if response.stop_reason == "tool_use" and tool_manager:
-            return self._handle_tool_execution(response, api_params, tool_manager)
-        
-        # Return direct response
-        return response.content[0].text
-    
-    def _handle_tool_execution(self, initial_response, base_params: Dict[str, Any], tool_manager):
-        """
-        Handle sequential tool calls (up to MAX_TOOL_ROUNDS) and return final text.
-
-        Args:
-            initial_response: The first response containing tool use requests
-            base_params: API parameters from generate_response (includes messages/system)
-            tool_manager: Manager to execute tools
-
-        Returns:
-            Final response text after all tool rounds complete
-        """
-        messages = base_params["messages"].copy()
-        current_response = initial_response
-        tools = base_params.get("tools")
-        system = base_params["system"]
-
-        for round_count in range(self.MAX_TOOL_ROUNDS):
-            # Append the assistant's tool_use response
-            messages.append({"role": "assistant", "content": current_response.content})
-
-            # Execute all tool calls in the current response
-            tool_results = []
-            for content_block in current_response.content:
-                if content_block.type == "tool_use":
-                    try:
-                        tool_result = tool_manager.execute_tool(
-                            content_block.name,
-                            **content_block.input
-                        )
-                    except Exception as e:
-                        tool_result = f"Tool execution error: {e}"
-
-                    tool_results.append({
-                        "type": "tool_result",
-                        "tool_use_id": content_block.id,
-                        "content": tool_result
-                    })
-
-            # Append tool results as user message
-            if tool_results:
-                messages.append({"role": "user", "content": tool_results})
-
-            # Include tools in intermediate rounds, omit on final round
-            is_final_round = (round_count + 1) >= self.MAX_TOOL_ROUNDS
-            next_params = {
-                **self.base_params,
-                "messages": messages,
-                "system": system,
-            }
-            if not is_final_round and tools:
-                next_params["tools"] = tools
-                next_params["tool_choice"] = {"type": "auto"}
-
-            current_response = self.client.messages.create(**next_params)
-
-            # Exit early if Claude didn't request more tools
-            if current_response.stop_reason != "tool_use":
-                break
-
+import asyncio
+import anthropic
+import httpx
+from typing import AsyncIterator, List, Optional, Dict, Any
+from models import ToolResult
+
+class AIGenerator:
+    """Handles interactions with Anthropic's Claude API for generating responses"""
+
+    __slots__ = ("client", "model", "base_params", "summary_model")
+    
+    MAX_TOOL_ROUNDS = 2
+
+    # Static system prompt to avoid rebuilding on each call
+    SYSTEM_PROMPT = """ You are an AI assistant specialized in course materials and educational content with access to a comprehensive search tool for course information.
+
+Tool Usage:
+- Use the **search_course_content** tool for questions about specific course content or detailed educational materials
+- Use the **get_course_outline** tool for questions about course structure, syllabus, outline, or lesson listings
+  - When presenting outline results, always include: the course title, the course link, and for each lesson its number and title
+- You may use up to 2 sequential tool calls per query when needed (e.g., first get an outline, then search based on results)
+- Most questions require only one tool call
+- Synthesize tool results into accurate, fact-based responses
+- If a tool yields no results, state this clearly without offering alternatives
+
+Response Protocol:
+- **General knowledge questions**: Answer using existing knowledge without searching
+- **Course outline/structure questions**: Use get_course_outline, then present the full outline with course title, course link, and all lessons
+- **Course content questions**: Use search_course_content, then answer
+- **No meta-commentary**:
+ - Provide direct answers only — no reasoning process, search explanations, or question-type analysis
+ - Do not mention "based on the search results" or "based on the tool results"
+
+
+All responses must be:
+1. **Brief, Concise and focused** - Get to the point quickly
+2. **Educational** - Maintain instructional value
+3. **Clear** - Use accessible language
+4. **Example-supported** - Include relevant examples when they aid understanding
+Provide only the direct answer to what was asked.
+"""
+
+    # Prebuilt system content, shared by every request and never mutated
+    _SYSTEM_BLOCK = [{"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}}]
+
+    SUMMARY_PROMPT = """Summarize the following conversation between a user and a course materials assistant.
+If a summary of earlier turns is given, fold the new turns into it.
+Keep the topics, courses, lessons and facts the user may refer back to. Reply with the summary only."""
+    
+    def __init__(self, api_key: str, model: str, http_client: Optional[httpx.AsyncClient] = None,
+                 summary_model: Optional[str] = None):
+        # A shared http_client lets several generators reuse one connection pool
+        self.client = anthropic.AsyncAnthropic(api_key=api_key, http_client=http_client)
+        self.model = model
+        
+        # Cheaper model used to fold old turns into a session's rolling summary
+        self.summary_model = summary_model or model
+        
+        # Pre-build base API parameters; hot paths shallow-copy this template
+        self.base_params = {
+            "model": self.model,
+            "temperature": 0,
+            "max_tokens": 800
+        }
+    
+    async def generate_response(self, query: str,
+                         conversation_history: Optional[str] = None,
+                         tools: Optional[List] = None,
+                         tool_manager=None,
+                         tool_results: Optional[List[ToolResult]] = None) -> str:
+        """
+        Generate AI response with optional tool usage and conversation context.
+        
+        Args:
+            query: The user's question or request
+            conversation_history: Previous messages for context
+            tools: Available tools the AI can use
+            tool_manager: Manager to execute tools
+            tool_results: Optional per-request list that receives every ToolResult
+            
+        Returns:
+            Generated response as string
+        """
+        
+        api_params = self._build_api_params(query, conversation_history, tools)
+        
+        # Get response from Claude
+        response = await self.client.messages.create(**api_params)
+        
+        # Handle tool execution if needed
+        if response.stop_reason == "tool_use" and tool_manager:
+            return await self._handle_tool_execution(response, api_params, tool_manager, tool_results)
+        
+        # Return direct response
+        return response.content[0].text
+
+    async def generate_response_stream(self, query: str,
+                                       conversation_history: Optional[str] = None,
+                                       tools: Optional[List] = None,
+                                       tool_manager=None,
+                                       tool_results: Optional[List[ToolResult]] = None) -> AsyncIterator[str]:
+        """
+        Stream an AI response as text deltas, running tool rounds in between.
+
+        Takes the same arguments as generate_response. Text from every round is
+        yielded as soon as it arrives; when a round ends in tool use, the tools are
+        executed and the follow-up round is streamed in turn.
+
+        Yields:
+            Text deltas of the response
+        """
+        params = self._build_api_params(query, conversation_history, tools)
+        messages = params["messages"]
+
+        for round_count in range(self.MAX_TOOL_ROUNDS + 1):
+            async with self.client.messages.stream(**params) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                response = await stream.get_final_message()
+
+            if response.stop_reason != "tool_use" or not tool_manager \
+                    or round_count >= self.MAX_TOOL_ROUNDS:
+                return
+
+            await self._run_tool_round(messages, response, tool_manager, tool_results)
+
+            # Include tools in intermediate rounds, omit on final round
+            if round_count + 1 >= self.MAX_TOOL_ROUNDS:
+                params.pop("tools", None)
+                params.pop("tool_choice", None)
+
+    async def generate_responses_batch(self, items: List[Dict[str, Any]],
+                                       poll_interval: float = 30.0,
+                                       timeout: float = 24 * 60 * 60) -> List[Optional[str]]:
+        """
+        Generate responses for independent queries through the Message Batches API.
+
+        Batches are billed at a discount but may take minutes to complete, so this
+        is meant for non-interactive workloads such as evaluation sweeps. Tools are
+        not offered: a batch request cannot run a tool loop. History is sent as
+        given; it is not condensed here, since that would cost a full-price call
+        per item before the discounted batch even starts.
+
+        Args:
+            items: Dicts with a "query" and an optional "conversation_history"
+            poll_interval: Seconds to wait between batch status checks
+            timeout: Seconds to wait for the batch before cancelling it
+
+        Returns:
+            Response text per item, in input order (None for failed requests)
+
+        Raises:
+            TimeoutError: If the batch has not ended within timeout
+        """
+        if not items:
+            return []
+
+        requests = [
+            {
+                "custom_id": str(index),
+                "params": self._build_api_params(item["query"], item.get("conversation_history"), None)
+            }
+            for index, item in enumerate(items)
+        ]
+
+        batch = await self.client.messages.batches.create(requests=requests)
+        try:
+            async with asyncio.timeout(timeout):
+                while batch.processing_status != "ended":
+                    await asyncio.sleep(poll_interval)
+                    batch = await self.client.messages.batches.retrieve(batch.id)
+        except (TimeoutError, asyncio.CancelledError):
+            # Don't leave an abandoned batch running (and billing) server-side,
+            # but a failed cancel must not mask why polling stopped
+            try:
+                await self.client.messages.batches.cancel(batch.id)
+            except Exception as e:
+                print(f"Error cancelling message batch {batch.id}: {e}")
+            raise
+
+        responses: List[Optional[str]] = [None] * len(items)
+        async for entry in await self.client.messages.batches.results(batch.id):
+            if entry.result.type == "succeeded":
+                responses[int(entry.custom_id)] = entry.result.message.content[0].text
+        return responses
+
+    async def summarize_history(self, turns: str, previous_summary: Optional[str] = None) -> Optional[str]:
+        """
+        Fold conversation turns into a session's rolling summary.
+
+        Only the turns leaving the verbatim history are sent, alongside the
+        previous summary, so each turn is summarized once rather than on every query.
+
+        Args:
+            turns: Formatted "Role: content" lines to fold in
+            previous_summary: The session's current summary, if any
+
+        Returns:
+            The updated summary, or None if the summary model call failed
+        """
+        content = turns
+        if previous_summary:
+            content = f"Summary of earlier turns: {previous_summary}\n\nNew turns:\n{turns}"
+
+        try:
+            response = await self.client.messages.create(
+                model=self.summary_model,
+                temperature=0,
+                max_tokens=300,
+                system=self.SUMMARY_PROMPT,
+                messages=[{"role": "user", "content": content}]
+            )
+        except Exception as e:
+            print(f"Error summarizing conversation history: {e}")
+            return None
+        return response.content[0].text
+
+    def _build_api_params(self, query: str,
+                          conversation_history: Optional[str],
+                          tools: Optional[List]) -> Dict[str, Any]:
+        """Build the initial messages.create parameters for a user query"""
+        api_params = self.base_params.copy()
+        api_params["messages"] = [{"role": "user", "content": query}]
+        api_params["system"] = self._build_system_blocks(conversation_history)
+        
+        # Add tools if available. The prompt prefix runs tools -> system -> messages,
+        # so the system prompt's cache breakpoint already covers the tools block
+        if tools:
+            api_params["tools"] = tools
+            api_params["tool_choice"] = {"type": "auto"}
+
+        return api_params
+    
+    def _build_system_blocks(self, conversation_history: Optional[str]) -> List[Dict[str, Any]]:
+        """
+        Build system content blocks with the static prompt marked for prompt caching.
+
+        The static SYSTEM_PROMPT comes first and carries the cache breakpoint so the
+        largest immutable prefix is served from Anthropic's prompt cache; the
+        per-session conversation history follows as an uncached block.
+        """
+        if not conversation_history:
+            return self._SYSTEM_BLOCK
+        return [
+            *self._SYSTEM_BLOCK,
+            {"type": "text", "text": f"Previous conversation:\n{conversation_history}"}
+        ]
+
+    async def _run_tool_round(self, messages: List[Dict[str, Any]], response, tool_manager,
+                              tool_results: Optional[List[ToolResult]] = None):
+        """
+        Execute the tool calls of a response and append the round to messages.
+
+        Args:
+            messages: Conversation messages, extended in place
+            response: Claude response containing tool use requests
+            tool_manager: Manager to execute tools
+            tool_results: Optional list extended with each call's ToolResult, in tool_use order
+        """
+        # Append the assistant's tool_use response
+        messages.append({"role": "assistant", "content": response.content})
+
+        # Execute all tool calls in the current response concurrently
+        calls = [b for b in response.content if b.type == "tool_use"]
+        results = await asyncio.gather(
+            *[tool_manager.execute_tool(b.name, **b.input) for b in calls],
+            return_exceptions=True
+        )
+
+        result_blocks = []
+        for content_block, tool_result in zip(calls, results):
+            if isinstance(tool_result, Exception):
+                tool_result = ToolResult(text=f"Tool execution error: {tool_result}", error=True)
+            if tool_results is not None:
+                tool_results.append(tool_result)
+
+            result_blocks.append({
+                "type": "tool_result",
+                "tool_use_id": content_block.id,
+                "content": tool_result.text
+            })
+
+        # Append tool results as user message, moving the cache breakpoint from the
+        # previous round's results to the newest tool_result so the next round
+        # reuses this round's prefix
+        if result_blocks:
+            previous = messages[-2]["content"]
+            if isinstance(previous, list):
+                previous[-1].pop("cache_control", None)
+            result_blocks[-1]["cache_control"] = {"type": "ephemeral"}
+            messages.append({"role": "user", "content": result_blocks})
+
+    async def _handle_tool_execution(self, initial_response, base_params: Dict[str, Any], tool_manager,
+                                     tool_results: Optional[List[ToolResult]] = None):
+        """
+        Handle sequential tool calls (up to MAX_TOOL_ROUNDS) and return final text.
+
+        Args:
+            initial_response: The first response containing tool use requests
+            base_params: API parameters from generate_response (includes messages/system)
+            tool_manager: Manager to execute tools
+            tool_results: Optional list that receives every ToolResult
+
+        Returns:
+            Final response text after all tool rounds complete
+        """
+        # The messages list is owned by this call, so extend it in place and
+        # reuse a single params dict across rounds
+        messages = base_params["messages"]
+        current_response = initial_response
+        tools = base_params.get("tools")
+        next_params = self.base_params.copy()
+        next_params["messages"] = messages
+        next_params["system"] = base_params["system"]
+
+        for round_count in range(self.MAX_TOOL_ROUNDS):
+            await self._run_tool_round(messages, current_response, tool_manager, tool_results)
+
+            # Include tools in intermediate rounds, omit on final round
+            is_final_round = (round_count + 1) >= self.MAX_TOOL_ROUNDS
+            if not is_final_round and tools:
+                next_params["tools"] = tools
+                next_params["tool_choice"] = {"type": "auto"}
+            else:
+                next_params.pop("tools", None)
+                next_params.pop("tool_choice", None)
+
+            current_response = await self.client.messages.create(**next_params)
+
+            # Exit early if Claude didn't request more tools
+            if current_response.stop_reason != "tool_use":
+                break
+
         return current_response.content[0].text
\ No newline at end of file
@@ -1,14 +1,19 @@
 import warnings
 warnings.filterwarnings("ignore", message="resource_tracker: There appear to be.*")
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from pydantic import BaseModel
 from typing import Any, Dict, List, Optional
+import json
 import os
 
+import anthropic
+import httpx
+
 from config import config
 from rag_system import RAGSystem
 
@@ -31,8 +36,17 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Shared keep-alive connection pool for all Anthropic API calls
+anthropic_http_client = anthropic.DefaultAsyncHttpxClient(
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20)
+)
+
 # Initialize RAG system
-rag_system = RAGSystem(config)
+rag_system = RAGSystem(config, http_client=anthropic_http_client)
+
+def get_rag_system() -> RAGSystem:
+    """Dependency that provides the shared RAG system to the API routes"""
+    return rag_system
 
 # Pydantic models for request/response
 class QueryRequest(BaseModel):
@@ -59,7 +73,7 @@ class SessionDeleteResponse(BaseModel):
 # API Endpoints
 
 @app.post("/api/query", response_model=QueryResponse)
-async def query_documents(request: QueryRequest):
+async def query_documents(request: QueryRequest, rag_system: RAGSystem = Depends(get_rag_system)):
     """Process a query and return response with sources"""
     try:
         # Create session if not provided
@@ -68,7 +82,7 @@ async def query_documents(request: QueryRequest):
             session_id = rag_system.session_manager.create_session()
         
         # Process query using RAG system
-        answer, sources = rag_system.query(request.query, session_id)
+        answer, sources = await rag_system.query(request.query, session_id)
         
         return QueryResponse(
             answer=answer,
@@ -78,8 +92,29 @@ async def query_documents(request: QueryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/query/stream")
+async def query_documents_stream(request: QueryRequest, rag_system: RAGSystem = Depends(get_rag_system)):
+    """Process a query and stream the response as server-sent events"""
+    session_id = request.session_id
+    if not session_id:
+        session_id = rag_system.session_manager.create_session()
+
+    async def event_stream():
+        events = rag_system.query_stream(request.query, session_id)
+        try:
+            async for event in events:
+                yield f"data: {json.dumps(event)}\n\n"
+            yield f"data: {json.dumps({'type': 'done', 'session_id': session_id})}\n\n"
+        except Exception as e:
+            yield f"data: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+        finally:
+            # Runs on client disconnect too, so the query's cleanup isn't left to GC
+            await events.aclose()
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
 @app.get("/api/courses", response_model=CourseStats)
-async def get_course_stats():
+async def get_course_stats(rag_system: RAGSystem = Depends(get_rag_system)):
     """Get course analytics and statistics"""
     try:
         analytics = rag_system.get_course_analytics()
@@ -91,7 +126,7 @@ async def get_course_stats():
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.delete("/api/session/{session_id}", response_model=SessionDeleteResponse)
-async def delete_session(session_id: str):
+async def delete_session(session_id: str, rag_system: RAGSystem = Depends(get_rag_system)):
     """Delete a session and its conversation history"""
     try:
         rag_system.session_manager.delete_session(session_id)
@@ -111,6 +146,11 @@ async def startup_event():
         except Exception as e:
             print(f"Error loading documents: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Close the shared Anthropic connection pool"""
+    await anthropic_http_client.aclose()
+
 # Custom static file handler with no-cache headers for development
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse
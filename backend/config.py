@@ -11,6 +11,7 @@ class Config:
     # Anthropic API settings
     ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
     ANTHROPIC_MODEL: str = "claude-sonnet-4-20250514"
+    SUMMARY_MODEL: str = "claude-3-5-haiku-20241022"  # Cheap model for condensing long history
     
     # Embedding model settings
     EMBEDDING_MODEL: str = "all-MiniLM-L6-v2"
@@ -20,6 +21,11 @@ class Config:
     CHUNK_OVERLAP: int = 100     # Characters to overlap between chunks
     MAX_RESULTS: int = 5         # Maximum search results to return
     MAX_HISTORY: int = 2         # Number of conversation messages to remember
+    MAX_HISTORY_TOKENS: int = 1500  # Estimated history tokens before older turns are summarized
+    
+    # Response cache settings
+    RESPONSE_CACHE_SIZE: int = 1024  # Maximum cached query responses (0 disables caching)
+    RESPONSE_CACHE_TTL: int = 600    # Seconds before a cached response expires
     
     # Database paths
     CHROMA_PATH: str = "./chroma_db"  # ChromaDB storage location
@@ -0,0 +1,27 @@
+"""
+Root test configuration shared by backend/test_*.py and backend/tests/.
+
+Integration tests (marked with @pytest.mark.integration) are skipped unless
+pytest is run with --run-integration.
+"""
+
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--run-integration",
+        action="store_true",
+        default=False,
+        help="run tests marked as integration",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--run-integration"):
+        return
+
+    skip = pytest.mark.skip(reason="integration: use --run-integration")
+    for item in items:
+        if "integration" in item.keywords:
+            item.add_marker(skip)
@@ -1,4 +1,4 @@
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
 from pydantic import BaseModel
 
 class Lesson(BaseModel):
@@ -19,4 +19,10 @@ class CourseChunk(BaseModel):
     content: str                        # The actual text content
     course_title: str                   # Which course this chunk belongs to
     lesson_number: Optional[int] = None # Which lesson this chunk is from
-    chunk_index: int                    # Position of this chunk in the document
\ No newline at end of file
+    chunk_index: int                    # Position of this chunk in the document
+
+class ToolResult(BaseModel):
+    """Outcome of a single tool call, returned per call instead of kept on the tool"""
+    text: str                                 # Result text sent back to Claude
+    sources: List[Dict[str, Any]] = []        # Sources shown in the UI for this call
+    error: bool = False                       # True if the tool failed rather than answered
@@ -1,23 +1,30 @@
-from typing import List, Tuple, Optional, Dict
+from typing import Any, AsyncIterator, List, Tuple, Optional, Dict
 import os
 from document_processor import DocumentProcessor
 from vector_store import VectorStore
 from ai_generator import AIGenerator
 from session_manager import SessionManager
+from response_cache import ResponseCache
 from search_tools import ToolManager, CourseSearchTool, CourseOutlineTool
-from models import Course, Lesson, CourseChunk
+from models import Course, Lesson, CourseChunk, ToolResult
 
 class RAGSystem:
     """Main orchestrator for the Retrieval-Augmented Generation system"""
     
-    def __init__(self, config):
+    def __init__(self, config, http_client=None):
         self.config = config
         
         # Initialize core components
         self.document_processor = DocumentProcessor(config.CHUNK_SIZE, config.CHUNK_OVERLAP)
         self.vector_store = VectorStore(config.CHROMA_PATH, config.EMBEDDING_MODEL, config.MAX_RESULTS)
-        self.ai_generator = AIGenerator(config.ANTHROPIC_API_KEY, config.ANTHROPIC_MODEL)
-        self.session_manager = SessionManager(config.MAX_HISTORY)
+        self.ai_generator = AIGenerator(
+            config.ANTHROPIC_API_KEY,
+            config.ANTHROPIC_MODEL,
+            http_client,
+            summary_model=config.SUMMARY_MODEL
+        )
+        self.session_manager = SessionManager(config.MAX_HISTORY, config.MAX_HISTORY_TOKENS)
+        self.response_cache = ResponseCache(config.RESPONSE_CACHE_SIZE, config.RESPONSE_CACHE_TTL)
         
         # Initialize search tools
         self.tool_manager = ToolManager()
@@ -46,6 +53,9 @@ class RAGSystem:
             # Add course content chunks to vector store
             self.vector_store.add_course_content(course_chunks)
             
+            # Cached answers may be stale now that the knowledge base changed
+            self.response_cache.clear()
+            
             return course, len(course_chunks)
         except Exception as e:
             print(f"Error processing course document {file_path}: {e}")
@@ -69,6 +79,7 @@ class RAGSystem:
         if clear_existing:
             print("Clearing existing data for fresh rebuild...")
             self.vector_store.clear_all_data()
+            self.response_cache.clear()
         
         if not os.path.exists(folder_path):
             print(f"Folder {folder_path} does not exist")
@@ -94,6 +105,7 @@ class RAGSystem:
                         total_chunks += len(course_chunks)
                         print(f"Added new course: {course.title} ({len(course_chunks)} chunks)")
                         existing_course_titles.add(course.title)
+                        self.response_cache.clear()
                     elif course:
                         print(f"Course already exists: {course.title} - skipping")
                 except Exception as e:
@@ -101,7 +113,7 @@ class RAGSystem:
         
         return total_courses, total_chunks
     
-    def query(self, query: str, session_id: Optional[str] = None) -> Tuple[str, List[str]]:
+    async def query(self, query: str, session_id: Optional[str] = None) -> Tuple[str, List[str]]:
         """
         Process a user query using the RAG system with tool-based search.
         
@@ -118,21 +130,30 @@ class RAGSystem:
         # Get conversation history if session exists
         history = None
         if session_id:
-            history = self.session_manager.get_conversation_history(session_id)
-        
-        # Generate response using AI with tools
-        response = self.ai_generator.generate_response(
-            query=prompt,
-            conversation_history=history,
-            tools=self.tool_manager.get_tool_definitions(),
-            tool_manager=self.tool_manager
-        )
+            history = await self._get_history(session_id)
         
-        # Get sources from the search tool
-        sources = self.tool_manager.get_last_sources()
+        # Serve repeated questions from the response cache
+        cache_key = self._response_cache_key(query, history)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            response, sources = cached
+        else:
+            # Generate response using AI with tools, collecting this request's tool results
+            tool_results = []
+            response = await self.ai_generator.generate_response(
+                query=prompt,
+                conversation_history=history,
+                tools=self.tool_manager.get_tool_definitions(),
+                tool_manager=self.tool_manager,
+                tool_results=tool_results
+            )
+            
+            # Get sources from this request's tool calls
+            sources = self._collect_sources(tool_results)
 
-        # Reset sources after retrieving them
-        self.tool_manager.reset_sources()
+            # Don't pin an answer written around a failed tool call for the full TTL
+            if not any(result.error for result in tool_results):
+                self.response_cache.set(cache_key, (response, sources))
         
         # Update conversation history
         if session_id:
@@ -141,6 +162,90 @@ class RAGSystem:
         # Return response with sources from tool searches
         return response, sources
     
+    async def query_stream(self, query: str, session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Process a user query like query(), streaming the response as it is generated.
+        
+        Args:
+            query: User's question
+            session_id: Optional session ID for conversation context
+            
+        Yields:
+            {"type": "delta", "text": ...} events for each text fragment, then a
+            final {"type": "sources", "sources": [...]} event
+        """
+        prompt = f"""Answer this question about course materials: {query}"""
+        
+        history = None
+        if session_id:
+            history = await self._get_history(session_id)
+        
+        cache_key = self._response_cache_key(query, history)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            response, sources = cached
+            yield {"type": "delta", "text": response}
+        else:
+            parts = []
+            tool_results = []
+            stream = self.ai_generator.generate_response_stream(
+                query=prompt,
+                conversation_history=history,
+                tools=self.tool_manager.get_tool_definitions(),
+                tool_manager=self.tool_manager,
+                tool_results=tool_results
+            )
+            rounds_seen = 0
+            try:
+                async for text in stream:
+                    # Text streamed before a tool round is preamble; keep only the
+                    # final round's answer for the history and the cache
+                    if len(tool_results) != rounds_seen:
+                        rounds_seen = len(tool_results)
+                        parts.clear()
+                    parts.append(text)
+                    yield {"type": "delta", "text": text}
+            finally:
+                # Close the model stream right away if the client disconnects
+                await stream.aclose()
+            
+            # A final round that only used tools leaves nothing but preamble
+            if len(tool_results) != rounds_seen:
+                parts.clear()
+            response = "".join(parts)
+            sources = self._collect_sources(tool_results)
+            if response and not any(result.error for result in tool_results):
+                self.response_cache.set(cache_key, (response, sources))
+        
+        # Record the full exchange once the stream has completed
+        if session_id:
+            self.session_manager.add_exchange(session_id, query, response)
+        
+        yield {"type": "sources", "sources": sources}
+    
+    async def _get_history(self, session_id: str) -> Optional[str]:
+        """Get a session's history, first folding turns over the token budget into its summary"""
+        older = self.session_manager.get_messages_to_summarize(session_id)
+        if older:
+            summary = await self.ai_generator.summarize_history(
+                SessionManager.format_messages(older),
+                self.session_manager.get_summary(session_id)
+            )
+            # On failure the full history is sent and folding is retried next turn
+            if summary is not None:
+                self.session_manager.fold_into_summary(session_id, summary, older)
+        return self.session_manager.get_conversation_history(session_id)
+
+    @staticmethod
+    def _collect_sources(tool_results: List[ToolResult]) -> List[Dict[str, Any]]:
+        """Merge the sources of one request's tool calls, in call order"""
+        return [source for result in tool_results for source in result.sources]
+
+    def _response_cache_key(self, query: str, history: Optional[str]) -> bytes:
+        """Cache key covering everything that shapes a response: query, history and tool set"""
+        tools_signature = ",".join(sorted(self.tool_manager.tools))
+        return ResponseCache.make_key(query, history, tools_signature)
+    
     def get_course_analytics(self) -> Dict:
         """Get analytics about the course catalog"""
         return {
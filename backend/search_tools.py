@@ -1,6 +1,21 @@
+import asyncio
+import functools
+import json
+from types import MappingProxyType
 from typing import Dict, Any, Optional, Protocol
 from abc import ABC, abstractmethod
 from vector_store import VectorStore, SearchResults
+from models import ToolResult
+
+
+@functools.lru_cache(maxsize=256)
+def _parse_lessons(lessons_json: str) -> tuple:
+    """
+    Parse a course's lessons_json metadata, caching by the raw string.
+
+    Every caller shares the cached lessons, so each one is a read-only mapping.
+    """
+    return tuple(MappingProxyType(lesson) for lesson in json.loads(lessons_json))
 
 
 class Tool(ABC):
@@ -16,13 +31,16 @@ class Tool(ABC):
         """Execute the tool with given parameters"""
         pass
 
+    def run(self, **kwargs) -> ToolResult:
+        """Execute the tool and return its text together with per-call sources"""
+        return ToolResult(text=self.execute(**kwargs))
+
 
 class CourseSearchTool(Tool):
     """Tool for searching course content with semantic course name matching"""
     
     def __init__(self, vector_store: VectorStore):
         self.store = vector_store
-        self.last_sources = []  # Track sources from last search
     
     def get_tool_definition(self) -> Dict[str, Any]:
         """Return Anthropic tool definition for this tool"""
@@ -61,7 +79,10 @@ class CourseSearchTool(Tool):
         Returns:
             Formatted search results or error message
         """
-        
+        return self.run(query=query, course_name=course_name, lesson_number=lesson_number).text
+
+    def run(self, query: str, course_name: Optional[str] = None, lesson_number: Optional[int] = None) -> ToolResult:
+        """Search like execute(), also returning the sources behind the results"""
         # Use the vector store's unified search interface
         results = self.store.search(
             query=query,
@@ -71,7 +92,7 @@ class CourseSearchTool(Tool):
         
         # Handle errors
         if results.error:
-            return results.error
+            return ToolResult(text=results.error, error=True)
         
         # Handle empty results
         if results.is_empty():
@@ -80,12 +101,12 @@ class CourseSearchTool(Tool):
                 filter_info += f" in course '{course_name}'"
             if lesson_number:
                 filter_info += f" in lesson {lesson_number}"
-            return f"No relevant content found{filter_info}."
+            return ToolResult(text=f"No relevant content found{filter_info}.")
         
         # Format and return results
         return self._format_results(results)
     
-    def _format_results(self, results: SearchResults) -> str:
+    def _format_results(self, results: SearchResults) -> ToolResult:
         """Format search results with course and lesson context"""
         formatted = []
         sources = []  # Track sources for the UI
@@ -110,10 +131,7 @@ class CourseSearchTool(Tool):
 
             formatted.append(f"{header}\n{doc}")
 
-        # Store sources for retrieval
-        self.last_sources = sources
-
-        return "\n\n".join(formatted)
+        return ToolResult(text="\n\n".join(formatted), sources=sources)
 
 class CourseOutlineTool(Tool):
     """Tool for retrieving course outline with title, link, and lesson list"""
@@ -148,24 +166,26 @@ class CourseOutlineTool(Tool):
         Returns:
             Formatted course outline or error message
         """
-        import json
+        return self.run(course_name=course_name).text
 
+    def run(self, course_name: str) -> ToolResult:
+        """Build the outline like execute(), flagging catalog failures as errors"""
         # Resolve fuzzy course name to exact title
         resolved_title = self.store._resolve_course_name(course_name)
         if not resolved_title:
-            return f"No course found matching '{course_name}'."
+            return ToolResult(text=f"No course found matching '{course_name}'.")
 
         # Fetch course metadata from catalog
         try:
             results = self.store.course_catalog.get(ids=[resolved_title])
             if not results or not results['metadatas'] or not results['metadatas'][0]:
-                return f"No metadata found for course '{resolved_title}'."
+                return ToolResult(text=f"No metadata found for course '{resolved_title}'.")
 
             metadata = results['metadatas'][0]
             course_title = metadata.get('title', resolved_title)
             course_link = metadata.get('course_link', 'N/A')
             lessons_json = metadata.get('lessons_json', '[]')
-            lessons = json.loads(lessons_json)
+            lessons = _parse_lessons(lessons_json)
 
             # Format the outline
             lines = [
@@ -180,9 +200,9 @@ class CourseOutlineTool(Tool):
                 lesson_title = lesson.get('lesson_title', 'Untitled')
                 lines.append(f"  Lesson {lesson_num}: {lesson_title}")
 
-            return "\n".join(lines)
+            return ToolResult(text="\n".join(lines))
         except Exception as e:
-            return f"Error retrieving course outline: {str(e)}"
+            return ToolResult(text=f"Error retrieving course outline: {str(e)}", error=True)
 
 
 class ToolManager:
@@ -190,6 +210,7 @@ class ToolManager:
     
     def __init__(self):
         self.tools = {}
+        self._definitions_cache: Optional[list] = None
     
     def register_tool(self, tool: Tool):
         """Register any tool that implements the Tool interface"""
@@ -198,29 +219,27 @@ class ToolManager:
         if not tool_name:
             raise ValueError("Tool must have a 'name' in its definition")
         self.tools[tool_name] = tool
+        self._definitions_cache = None
 
     
     def get_tool_definitions(self) -> list:
-        """Get all tool definitions for Anthropic tool calling"""
-        return [tool.get_tool_definition() for tool in self.tools.values()]
+        """Get all tool definitions for Anthropic tool calling (cached; treat as read-only)"""
+        if self._definitions_cache is None:
+            self._definitions_cache = [tool.get_tool_definition() for tool in self.tools.values()]
+        return self._definitions_cache
     
-    def execute_tool(self, tool_name: str, **kwargs) -> str:
-        """Execute a tool by name with given parameters"""
+    async def execute_tool(self, tool_name: str, **kwargs) -> ToolResult:
+        """
+        Execute a tool by name with given parameters.
+
+        Sources are returned with each result rather than stored on the tool,
+        so concurrent requests and parallel calls never see each other's.
+        """
         if tool_name not in self.tools:
-            return f"Tool '{tool_name}' not found"
+            return ToolResult(text=f"Tool '{tool_name}' not found", error=True)
         
-        return self.tools[tool_name].execute(**kwargs)
-    
-    def get_last_sources(self) -> list:
-        """Get sources from the last search operation"""
-        # Check all tools for last_sources attribute
-        for tool in self.tools.values():
-            if hasattr(tool, 'last_sources') and tool.last_sources:
-                return tool.last_sources
-        return []
-
-    def reset_sources(self):
-        """Reset sources from all tools that track sources"""
-        for tool in self.tools.values():
-            if hasattr(tool, 'last_sources'):
-                tool.last_sources = []
\ No newline at end of file
+        # Tools do blocking vector store I/O, so run them off the event loop.
+        # Parallel calls share the VectorStore: the Chroma client is safe to
+        # query from several threads, and SentenceTransformer inference only
+        # reads the model weights, so concurrent searches need no extra locking.
+        return await asyncio.to_thread(self.tools[tool_name].run, **kwargs)
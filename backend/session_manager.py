@@ -9,11 +9,22 @@ class Message:
 
 class SessionManager:
     """Manages conversation sessions and message history"""
+
+    # Rough characters-per-token ratio used to estimate history size without an API call
+    CHARS_PER_TOKEN = 4
     
-    def __init__(self, max_history: int = 5):
+    def __init__(self, max_history: int = 5, max_history_tokens: Optional[int] = None,
+                 keep_recent_messages: int = 2):
         self.max_history = max_history
         self.sessions: Dict[str, List[Message]] = {}
         self.session_counter = 0
+
+        # Rolling summaries of turns folded out of the history. With a token budget
+        # set, turns past the max_history window are folded in rather than dropped,
+        # and once the budget is exceeded only keep_recent_messages stay verbatim
+        self.max_history_tokens = max_history_tokens
+        self.keep_recent_messages = keep_recent_messages
+        self.summaries: Dict[str, str] = {}
     
     def create_session(self) -> str:
         """Create a new conversation session"""
@@ -30,8 +41,9 @@ class SessionManager:
         message = Message(role=role, content=content)
         self.sessions[session_id].append(message)
         
-        # Keep conversation history within limits
-        if len(self.sessions[session_id]) > self.max_history * 2:
+        # Keep conversation history within limits. With summaries enabled the
+        # older turns are left for get_messages_to_summarize to fold instead
+        if self.max_history_tokens is None and len(self.sessions[session_id]) > self.max_history * 2:
             self.sessions[session_id] = self.sessions[session_id][-self.max_history * 2:]
     
     def add_exchange(self, session_id: str, user_message: str, assistant_message: str):
@@ -45,22 +57,70 @@ class SessionManager:
             return None
         
         messages = self.sessions[session_id]
-        if not messages:
+        summary = self.summaries.get(session_id)
+        if not messages and not summary:
             return None
         
-        # Format messages for context
-        formatted_messages = []
-        for msg in messages:
-            formatted_messages.append(f"{msg.role.title()}: {msg.content}")
+        # Format messages for context, after the summary of any folded turns
+        formatted_messages = [f"Summary of earlier turns: {summary}"] if summary else []
+        if messages:
+            formatted_messages.append(self.format_messages(messages))
         
         return "\n".join(formatted_messages)
+
+    @staticmethod
+    def format_messages(messages: List[Message]) -> str:
+        """Format messages as "Role: content" lines"""
+        return "\n".join(f"{msg.role.title()}: {msg.content}" for msg in messages)
+
+    def get_summary(self, session_id: str) -> Optional[str]:
+        """Get the rolling summary of a session's folded turns, if any"""
+        return self.summaries.get(session_id)
+
+    def get_messages_to_summarize(self, session_id: Optional[str]) -> List[Message]:
+        """
+        Get the oldest messages to fold into the summary.
+
+        These are the messages past the max_history window, which add_message
+        keeps for folding instead of dropping. If the history is still over
+        max_history_tokens, everything but keep_recent_messages is included.
+        """
+        if self.max_history_tokens is None or session_id not in self.sessions:
+            return []
+
+        messages = self.sessions[session_id]
+        keep = min(len(messages), self.max_history * 2)
+
+        size = sum(len(msg.content) for msg in messages[-keep:]) + len(self.summaries.get(session_id, ""))
+        if size // self.CHARS_PER_TOKEN > self.max_history_tokens:
+            keep = min(keep, self.keep_recent_messages)
+
+        return messages[:len(messages) - keep]
+
+    def fold_into_summary(self, session_id: str, summary: str, folded: List[Message]):
+        """
+        Replace the session's summary and drop the messages it now covers.
+
+        Ignored if those messages are no longer the oldest in the session, e.g.
+        because a concurrent request on the same session folded them first.
+        """
+        messages = self.sessions.get(session_id)
+        if messages is None or len(messages) < len(folded):
+            return
+        if any(current is not old for current, old in zip(messages, folded)):
+            return
+
+        self.summaries[session_id] = summary
+        self.sessions[session_id] = messages[len(folded):]
     
     def clear_session(self, session_id: str):
         """Clear all messages from a session"""
         if session_id in self.sessions:
             self.sessions[session_id] = []
+        self.summaries.pop(session_id, None)
 
     def delete_session(self, session_id: str):
         """Remove a session entirely from memory"""
         if session_id in self.sessions:
-            del self.sessions[session_id]
\ No newline at end of file
+            del self.sessions[session_id]
+        self.summaries.pop(session_id, None)
@@ -1,8 +1,10 @@
 """Tests for ai_generator.py — AIGenerator and its tool-handling logic."""
 
+import asyncio
 import pytest
-from unittest.mock import MagicMock, patch, PropertyMock
+from unittest.mock import AsyncMock, MagicMock
 from ai_generator import AIGenerator
+from models import ToolResult
 
 
 # ---------------------------------------------------------------------------
@@ -32,24 +34,48 @@ def _make_response(content_blocks, stop_reason="end_turn"):
     return resp
 
 
+class _FakeStream:
+    """Stand-in for the SDK's async message stream context manager."""
+
+    def __init__(self, texts, final_response):
+        self._texts = texts
+        self._final = final_response
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @property
+    async def text_stream(self):
+        for text in self._texts:
+            yield text
+
+    async def get_final_message(self):
+        return self._final
+
+
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
 
 @pytest.fixture
-def ai_gen():
+def ai_gen(monkeypatch):
     """AIGenerator with a mocked Anthropic client."""
-    with patch("ai_generator.anthropic.Anthropic") as MockClient:
-        gen = AIGenerator(api_key="test-key", model="claude-test")
-        # Replace the real client with our mock
-        gen.client = MockClient.return_value
-        yield gen
+    MockClient = MagicMock()
+    monkeypatch.setattr("ai_generator.anthropic.AsyncAnthropic", MockClient)
+    gen = AIGenerator(api_key="test-key", model="claude-test")
+    # Replace the real client with our mock
+    gen.client = MockClient.return_value
+    gen.client.messages.create = AsyncMock()
+    return gen
 
 
 @pytest.fixture
 def mock_tool_manager():
     tm = MagicMock()
-    tm.execute_tool.return_value = "tool result text"
+    tm.execute_tool = AsyncMock(return_value=ToolResult(text="tool result text"))
     return tm
 
 
@@ -63,6 +89,16 @@ class TestAIGeneratorInit:
         assert ai_gen.base_params["temperature"] == 0
         assert ai_gen.base_params["max_tokens"] == 800
 
+    def test_uses_slots(self, ai_gen):
+        assert not hasattr(ai_gen, "__dict__")
+
+    def test_shared_http_client_passed_to_sdk(self, monkeypatch):
+        http_client = object()
+        MockClient = MagicMock()
+        monkeypatch.setattr("ai_generator.anthropic.AsyncAnthropic", MockClient)
+        AIGenerator(api_key="test-key", model="claude-test", http_client=http_client)
+        MockClient.assert_called_once_with(api_key="test-key", http_client=http_client)
+
     def test_system_prompt_exists(self, ai_gen):
         assert "search_course_content" in AIGenerator.SYSTEM_PROMPT
         assert "get_course_outline" in AIGenerator.SYSTEM_PROMPT
@@ -74,53 +110,81 @@ class TestAIGeneratorInit:
 # ---------------------------------------------------------------------------
 
 class TestDirectResponse:
-    def test_returns_text(self, ai_gen):
+    async def test_returns_text(self, ai_gen):
         ai_gen.client.messages.create.return_value = _make_response(
             [_make_text_block("Hello!")], stop_reason="end_turn"
         )
-        result = ai_gen.generate_response(query="Hi")
+        result = await ai_gen.generate_response(query="Hi")
         assert result == "Hello!"
 
-    def test_passes_system_prompt(self, ai_gen):
+    async def test_passes_system_prompt(self, ai_gen):
         ai_gen.client.messages.create.return_value = _make_response(
             [_make_text_block("ok")]
         )
-        ai_gen.generate_response(query="test")
+        await ai_gen.generate_response(query="test")
         call_kwargs = ai_gen.client.messages.create.call_args[1]
-        assert AIGenerator.SYSTEM_PROMPT in call_kwargs["system"]
+        system = call_kwargs["system"]
+        assert isinstance(system, list)
+        assert system[0]["type"] == "text"
+        assert system[0]["text"] == AIGenerator.SYSTEM_PROMPT
+        assert system[0]["cache_control"] == {"type": "ephemeral"}
 
-    def test_conversation_history_appended_to_system(self, ai_gen):
+    async def test_conversation_history_appended_to_system(self, ai_gen):
         ai_gen.client.messages.create.return_value = _make_response(
             [_make_text_block("ok")]
         )
-        ai_gen.generate_response(query="test", conversation_history="User: hi\nAssistant: hello")
+        await ai_gen.generate_response(query="test", conversation_history="User: hi\nAssistant: hello")
         call_kwargs = ai_gen.client.messages.create.call_args[1]
-        assert "Previous conversation:" in call_kwargs["system"]
-        assert "User: hi" in call_kwargs["system"]
-
-    def test_no_history_no_previous_section(self, ai_gen):
+        system = call_kwargs["system"]
+        assert len(system) == 2
+        assert system[0]["text"] == AIGenerator.SYSTEM_PROMPT
+        assert system[1]["text"].startswith("Previous conversation:")
+        assert "User: hi" in system[1]["text"]
+        # History changes every turn, so it must not carry a cache breakpoint
+        assert "cache_control" not in system[1]
+
+    def test_prebuilt_system_block_used_without_history(self, ai_gen):
+        assert ai_gen._build_system_blocks(None) is AIGenerator._SYSTEM_BLOCK
+        assert ai_gen._build_system_blocks("") is AIGenerator._SYSTEM_BLOCK
+
+    def test_system_prompt_block_shared_with_history(self, ai_gen):
+        blocks = ai_gen._build_system_blocks("User: hi\nAssistant: hello")
+        assert blocks[0] is AIGenerator._SYSTEM_BLOCK[0]
+        assert blocks[1] == {"type": "text", "text": "Previous conversation:\nUser: hi\nAssistant: hello"}
+
+    async def test_no_history_no_previous_section(self, ai_gen):
         ai_gen.client.messages.create.return_value = _make_response(
             [_make_text_block("ok")]
         )
-        ai_gen.generate_response(query="test", conversation_history=None)
+        await ai_gen.generate_response(query="test", conversation_history=None)
         call_kwargs = ai_gen.client.messages.create.call_args[1]
-        assert "Previous conversation:" not in call_kwargs["system"]
+        assert len(call_kwargs["system"]) == 1
 
-    def test_tools_passed_when_provided(self, ai_gen):
+    async def test_tools_passed_when_provided(self, ai_gen):
         ai_gen.client.messages.create.return_value = _make_response(
             [_make_text_block("ok")]
         )
         tools = [{"name": "search_course_content", "input_schema": {}}]
-        ai_gen.generate_response(query="test", tools=tools)
+        await ai_gen.generate_response(query="test", tools=tools)
         call_kwargs = ai_gen.client.messages.create.call_args[1]
         assert call_kwargs["tools"] == tools
         assert call_kwargs["tool_choice"] == {"type": "auto"}
 
-    def test_no_tools_key_when_none(self, ai_gen):
+    async def test_no_cache_breakpoint_on_tools(self, ai_gen):
         ai_gen.client.messages.create.return_value = _make_response(
             [_make_text_block("ok")]
         )
-        ai_gen.generate_response(query="test", tools=None)
+        tools = [{"name": "search_course_content"}, {"name": "get_course_outline"}]
+        await ai_gen.generate_response(query="test", tools=tools)
+        sent_tools = ai_gen.client.messages.create.call_args[1]["tools"]
+        # The system prompt breakpoint already caches the tools that precede it
+        assert all("cache_control" not in tool for tool in sent_tools)
+
+    async def test_no_tools_key_when_none(self, ai_gen):
+        ai_gen.client.messages.create.return_value = _make_response(
+            [_make_text_block("ok")]
+        )
+        await ai_gen.generate_response(query="test", tools=None)
         call_kwargs = ai_gen.client.messages.create.call_args[1]
         assert "tools" not in call_kwargs
 
@@ -130,7 +194,7 @@ class TestDirectResponse:
 # ---------------------------------------------------------------------------
 
 class TestToolExecution:
-    def test_tool_use_triggers_second_api_call(self, ai_gen, mock_tool_manager):
+    async def test_tool_use_triggers_second_api_call(self, ai_gen, mock_tool_manager):
         # First call returns tool_use
         tool_block = _make_tool_use_block("search_course_content", {"query": "ML"})
         first_resp = _make_response([tool_block], stop_reason="tool_use")
@@ -138,7 +202,7 @@ class TestToolExecution:
         final_resp = _make_response([_make_text_block("Final answer")])
         ai_gen.client.messages.create.side_effect = [first_resp, final_resp]
 
-        result = ai_gen.generate_response(
+        result = await ai_gen.generate_response(
             query="What is ML?",
             tools=[{"name": "search_course_content"}],
             tool_manager=mock_tool_manager,
@@ -149,13 +213,13 @@ class TestToolExecution:
             "search_course_content", query="ML"
         )
 
-    def test_tool_result_sent_back_to_api(self, ai_gen, mock_tool_manager):
+    async def test_tool_result_sent_back_to_api(self, ai_gen, mock_tool_manager):
         tool_block = _make_tool_use_block("search_course_content", {"query": "x"}, tool_id="t1")
         first_resp = _make_response([tool_block], stop_reason="tool_use")
         final_resp = _make_response([_make_text_block("done")])
         ai_gen.client.messages.create.side_effect = [first_resp, final_resp]
 
-        ai_gen.generate_response(
+        await ai_gen.generate_response(
             query="q", tools=[{}], tool_manager=mock_tool_manager
         )
 
@@ -168,68 +232,153 @@ class TestToolExecution:
         assert tool_result_msg["content"][0]["tool_use_id"] == "t1"
         assert tool_result_msg["content"][0]["content"] == "tool result text"
 
-    def test_multiple_tool_calls_in_one_response(self, ai_gen, mock_tool_manager):
+    async def test_last_tool_result_marked_as_cache_breakpoint(self, ai_gen, mock_tool_manager):
+        block1 = _make_tool_use_block("search_course_content", {"query": "a"}, "t1")
+        block2 = _make_tool_use_block("get_course_outline", {"course_name": "ML"}, "t2")
+        first_resp = _make_response([block1, block2], stop_reason="tool_use")
+        final_resp = _make_response([_make_text_block("done")])
+        ai_gen.client.messages.create.side_effect = [first_resp, final_resp]
+
+        await ai_gen.generate_response(query="q", tools=[{}], tool_manager=mock_tool_manager)
+
+        tool_results = ai_gen.client.messages.create.call_args_list[1][1]["messages"][2]["content"]
+        assert "cache_control" not in tool_results[0]
+        assert tool_results[-1]["cache_control"] == {"type": "ephemeral"}
+
+    async def test_multiple_tool_calls_in_one_response(self, ai_gen, mock_tool_manager):
         block1 = _make_tool_use_block("search_course_content", {"query": "a"}, "t1")
         block2 = _make_tool_use_block("get_course_outline", {"course_name": "ML"}, "t2")
         first_resp = _make_response([block1, block2], stop_reason="tool_use")
         final_resp = _make_response([_make_text_block("combined")])
         ai_gen.client.messages.create.side_effect = [first_resp, final_resp]
 
-        result = ai_gen.generate_response(
+        result = await ai_gen.generate_response(
             query="q", tools=[{}], tool_manager=mock_tool_manager
         )
         assert result == "combined"
         assert mock_tool_manager.execute_tool.call_count == 2
 
-    def test_no_tool_execution_without_tool_manager(self, ai_gen):
+    async def test_parallel_tool_results_keep_tool_use_pairing(self, ai_gen, mock_tool_manager):
+        block1 = _make_tool_use_block("search_course_content", {"query": "a"}, "t1")
+        block2 = _make_tool_use_block("get_course_outline", {"course_name": "ML"}, "t2")
+        first_resp = _make_response([block1, block2], stop_reason="tool_use")
+        final_resp = _make_response([_make_text_block("combined")])
+        ai_gen.client.messages.create.side_effect = [first_resp, final_resp]
+        mock_tool_manager.execute_tool.side_effect = [
+            ToolResult(text="search hits"), Exception("outline failed")
+        ]
+        collected = []
+
+        await ai_gen.generate_response(query="q", tools=[{}], tool_manager=mock_tool_manager,
+                                       tool_results=collected)
+
+        tool_results = ai_gen.client.messages.create.call_args_list[1][1]["messages"][2]["content"]
+        assert [r["tool_use_id"] for r in tool_results] == ["t1", "t2"]
+        assert tool_results[0]["content"] == "search hits"
+        assert tool_results[1]["content"] == "Tool execution error: outline failed"
+        assert [r.error for r in collected] == [False, True]
+
+    async def test_parallel_tool_results_collected_in_tool_use_order(self, ai_gen, mock_tool_manager):
+        block1 = _make_tool_use_block("search_course_content", {"query": "slow"}, "t1")
+        block2 = _make_tool_use_block("search_course_content", {"query": "fast"}, "t2")
+        first_resp = _make_response([block1, block2], stop_reason="tool_use")
+        ai_gen.client.messages.create.side_effect = [first_resp, _make_response([_make_text_block("ok")])]
+        finished = []
+
+        async def execute(name, query):
+            # The first call finishes last
+            if query == "slow":
+                await asyncio.sleep(0.01)
+            finished.append(query)
+            return ToolResult(text=query, sources=[{"label": query, "link": None}])
+
+        mock_tool_manager.execute_tool.side_effect = execute
+        collected = []
+
+        await ai_gen.generate_response(query="q", tools=[{}], tool_manager=mock_tool_manager,
+                                       tool_results=collected)
+
+        assert finished == ["fast", "slow"]
+        assert [r.sources[0]["label"] for r in collected] == ["slow", "fast"]
+
+    async def test_tool_results_collected_across_rounds(self, ai_gen, mock_tool_manager):
+        resp1 = _make_response([_make_tool_use_block("search_course_content", {"query": "a"}, "t1")],
+                               stop_reason="tool_use")
+        resp2 = _make_response([_make_tool_use_block("search_course_content", {"query": "b"}, "t2")],
+                               stop_reason="tool_use")
+        resp_final = _make_response([_make_text_block("done")])
+        ai_gen.client.messages.create.side_effect = [resp1, resp2, resp_final]
+        first = ToolResult(text="a hits", sources=[{"label": "A", "link": None}])
+        second = ToolResult(text="b hits", sources=[{"label": "B", "link": None}])
+        mock_tool_manager.execute_tool.side_effect = [first, second]
+        collected = []
+
+        await ai_gen.generate_response(query="q", tools=[{}], tool_manager=mock_tool_manager,
+                                       tool_results=collected)
+
+        assert collected == [first, second]
+
+    async def test_no_tool_execution_without_tool_manager(self, ai_gen):
         """If stop_reason is tool_use but no tool_manager provided, return text."""
         text_block = _make_text_block("partial")
         resp = _make_response([text_block], stop_reason="tool_use")
         ai_gen.client.messages.create.return_value = resp
 
-        result = ai_gen.generate_response(query="q")
+        result = await ai_gen.generate_response(query="q")
         # Falls through to return content[0].text since tool_manager is None
         assert result == "partial"
 
-    def test_intermediate_call_includes_tools(self, ai_gen, mock_tool_manager):
+    async def test_intermediate_call_includes_tools(self, ai_gen, mock_tool_manager):
         """After round 1, the follow-up call includes tools (allowing a second round)."""
         tool_block = _make_tool_use_block("search_course_content", {"query": "x"})
         first_resp = _make_response([tool_block], stop_reason="tool_use")
         final_resp = _make_response([_make_text_block("done")])
         ai_gen.client.messages.create.side_effect = [first_resp, final_resp]
 
-        ai_gen.generate_response(
+        await ai_gen.generate_response(
             query="q", tools=[{"name": "t"}], tool_manager=mock_tool_manager
         )
         second_call_kwargs = ai_gen.client.messages.create.call_args_list[1][1]
         assert "tools" in second_call_kwargs
 
+    async def test_same_tools_sent_across_rounds(self, ai_gen, mock_tool_manager):
+        tool_block = _make_tool_use_block("search_course_content", {"query": "x"})
+        first_resp = _make_response([tool_block], stop_reason="tool_use")
+        final_resp = _make_response([_make_text_block("done")])
+        ai_gen.client.messages.create.side_effect = [first_resp, final_resp]
+
+        await ai_gen.generate_response(
+            query="q", tools=[{"name": "t"}], tool_manager=mock_tool_manager
+        )
+        first_call, second_call = ai_gen.client.messages.create.call_args_list
+        assert second_call[1]["tools"] == first_call[1]["tools"] == [{"name": "t"}]
+
 
 # ---------------------------------------------------------------------------
 # Edge cases
 # ---------------------------------------------------------------------------
 
 class TestEdgeCases:
-    def test_api_error_propagates(self, ai_gen):
+    async def test_api_error_propagates(self, ai_gen):
         ai_gen.client.messages.create.side_effect = Exception("API down")
         with pytest.raises(Exception, match="API down"):
-            ai_gen.generate_response(query="test")
+            await ai_gen.generate_response(query="test")
 
-    def test_empty_query(self, ai_gen):
+    async def test_empty_query(self, ai_gen):
         ai_gen.client.messages.create.return_value = _make_response(
             [_make_text_block("I need more info")]
         )
-        result = ai_gen.generate_response(query="")
+        result = await ai_gen.generate_response(query="")
         assert isinstance(result, str)
 
-    def test_empty_conversation_history_string(self, ai_gen):
+    async def test_empty_conversation_history_string(self, ai_gen):
         """Empty string should be falsy, so no 'Previous conversation' section."""
         ai_gen.client.messages.create.return_value = _make_response(
             [_make_text_block("ok")]
         )
-        ai_gen.generate_response(query="test", conversation_history="")
+        await ai_gen.generate_response(query="test", conversation_history="")
         call_kwargs = ai_gen.client.messages.create.call_args[1]
-        assert "Previous conversation:" not in call_kwargs["system"]
+        assert len(call_kwargs["system"]) == 1
 
 
 # ---------------------------------------------------------------------------
@@ -237,7 +386,7 @@ class TestEdgeCases:
 # ---------------------------------------------------------------------------
 
 class TestMultiRoundToolExecution:
-    def test_two_sequential_tool_rounds(self, ai_gen, mock_tool_manager):
+    async def test_two_sequential_tool_rounds(self, ai_gen, mock_tool_manager):
         """Claude calls a tool, gets results, calls another tool, then gives final answer."""
         tool_block_1 = _make_tool_use_block("get_course_outline", {"course_name": "ML"}, "t1")
         resp1 = _make_response([tool_block_1], stop_reason="tool_use")
@@ -247,7 +396,7 @@ class TestMultiRoundToolExecution:
 
         ai_gen.client.messages.create.side_effect = [resp1, resp2, resp_final]
 
-        result = ai_gen.generate_response(
+        result = await ai_gen.generate_response(
             query="Find courses related to lesson 4 of ML",
             tools=[{"name": "get_course_outline"}, {"name": "search_course_content"}],
             tool_manager=mock_tool_manager,
@@ -256,7 +405,7 @@ class TestMultiRoundToolExecution:
         assert ai_gen.client.messages.create.call_count == 3
         assert mock_tool_manager.execute_tool.call_count == 2
 
-    def test_intermediate_call_includes_tools(self, ai_gen, mock_tool_manager):
+    async def test_intermediate_call_includes_tools(self, ai_gen, mock_tool_manager):
         """Between round 1 and round 2, the API call includes tools."""
         tool_block_1 = _make_tool_use_block("search_course_content", {"query": "q"}, "t1")
         resp1 = _make_response([tool_block_1], stop_reason="tool_use")
@@ -265,13 +414,13 @@ class TestMultiRoundToolExecution:
         ai_gen.client.messages.create.side_effect = [resp1, resp_text]
 
         tools = [{"name": "search_course_content"}]
-        ai_gen.generate_response(query="q", tools=tools, tool_manager=mock_tool_manager)
+        await ai_gen.generate_response(query="q", tools=tools, tool_manager=mock_tool_manager)
 
         # round_count=0, not final round (0+1 < 2), so tools should be included
         second_call_kwargs = ai_gen.client.messages.create.call_args_list[1][1]
         assert "tools" in second_call_kwargs
 
-    def test_final_round_omits_tools(self, ai_gen, mock_tool_manager):
+    async def test_final_round_omits_tools(self, ai_gen, mock_tool_manager):
         """After MAX_TOOL_ROUNDS tool rounds, the synthesis call omits tools."""
         tool_block_1 = _make_tool_use_block("search_course_content", {"query": "a"}, "t1")
         resp1 = _make_response([tool_block_1], stop_reason="tool_use")
@@ -282,13 +431,13 @@ class TestMultiRoundToolExecution:
         ai_gen.client.messages.create.side_effect = [resp1, resp2, resp_final]
 
         tools = [{"name": "search_course_content"}, {"name": "get_course_outline"}]
-        ai_gen.generate_response(query="q", tools=tools, tool_manager=mock_tool_manager)
+        await ai_gen.generate_response(query="q", tools=tools, tool_manager=mock_tool_manager)
 
         # Third API call (after 2 tool rounds) must have no tools
         third_call_kwargs = ai_gen.client.messages.create.call_args_list[2][1]
         assert "tools" not in third_call_kwargs
 
-    def test_messages_grow_correctly_across_rounds(self, ai_gen, mock_tool_manager):
+    async def test_messages_grow_correctly_across_rounds(self, ai_gen, mock_tool_manager):
         """Final call has 5 messages: user, asst(tool1), user(result1), asst(tool2), user(result2)."""
         tool_block_1 = _make_tool_use_block("search_course_content", {"query": "a"}, "t1")
         resp1 = _make_response([tool_block_1], stop_reason="tool_use")
@@ -298,7 +447,7 @@ class TestMultiRoundToolExecution:
 
         ai_gen.client.messages.create.side_effect = [resp1, resp2, resp_final]
 
-        ai_gen.generate_response(query="q", tools=[{}], tool_manager=mock_tool_manager)
+        await ai_gen.generate_response(query="q", tools=[{}], tool_manager=mock_tool_manager)
 
         third_call_kwargs = ai_gen.client.messages.create.call_args_list[2][1]
         messages = third_call_kwargs["messages"]
@@ -310,8 +459,11 @@ class TestMultiRoundToolExecution:
         assert messages[4]["role"] == "user"
         assert messages[2]["content"][0]["tool_use_id"] == "t1"
         assert messages[4]["content"][0]["tool_use_id"] == "t2"
+        # Only the newest tool_result carries the moving cache breakpoint
+        assert "cache_control" not in messages[2]["content"][-1]
+        assert messages[4]["content"][-1]["cache_control"] == {"type": "ephemeral"}
 
-    def test_early_exit_when_claude_stops_using_tools(self, ai_gen, mock_tool_manager):
+    async def test_early_exit_when_claude_stops_using_tools(self, ai_gen, mock_tool_manager):
         """If Claude returns text after round 1, only 2 API calls total."""
         tool_block_1 = _make_tool_use_block("search_course_content", {"query": "q"}, "t1")
         resp1 = _make_response([tool_block_1], stop_reason="tool_use")
@@ -319,7 +471,7 @@ class TestMultiRoundToolExecution:
 
         ai_gen.client.messages.create.side_effect = [resp1, resp_text]
 
-        result = ai_gen.generate_response(
+        result = await ai_gen.generate_response(
             query="q",
             tools=[{"name": "search_course_content"}],
             tool_manager=mock_tool_manager,
@@ -327,7 +479,7 @@ class TestMultiRoundToolExecution:
         assert result == "Enough info"
         assert ai_gen.client.messages.create.call_count == 2
 
-    def test_tool_error_returns_graceful_message(self, ai_gen, mock_tool_manager):
+    async def test_tool_error_returns_graceful_message(self, ai_gen, mock_tool_manager):
         """If tool raises an exception, error string is sent to Claude."""
         tool_block = _make_tool_use_block("search_course_content", {"query": "x"}, "t1")
         resp1 = _make_response([tool_block], stop_reason="tool_use")
@@ -336,7 +488,7 @@ class TestMultiRoundToolExecution:
         ai_gen.client.messages.create.side_effect = [resp1, resp_final]
         mock_tool_manager.execute_tool.side_effect = Exception("DB connection failed")
 
-        result = ai_gen.generate_response(query="q", tools=[{}], tool_manager=mock_tool_manager)
+        result = await ai_gen.generate_response(query="q", tools=[{}], tool_manager=mock_tool_manager)
         assert result == "Sorry, I could not search"
 
         second_call_msgs = ai_gen.client.messages.create.call_args_list[1][1]["messages"]
@@ -346,3 +498,196 @@ class TestMultiRoundToolExecution:
 
     def test_max_rounds_constant(self):
         assert AIGenerator.MAX_TOOL_ROUNDS == 2
+
+
+# ---------------------------------------------------------------------------
+# generate_responses_batch
+# ---------------------------------------------------------------------------
+
+def _make_batch_entry(custom_id: str, text: str = None):
+    entry = MagicMock()
+    entry.custom_id = custom_id
+    if text is None:
+        entry.result.type = "errored"
+    else:
+        entry.result.type = "succeeded"
+        entry.result.message = _make_response([_make_text_block(text)])
+    return entry
+
+
+class _AsyncEntries:
+    def __init__(self, entries):
+        self._entries = entries
+
+    def __aiter__(self):
+        return self._iter()
+
+    async def _iter(self):
+        for entry in self._entries:
+            yield entry
+
+
+class TestBatchResponses:
+    async def test_submits_batch_and_returns_results_in_order(self, ai_gen):
+        batches = ai_gen.client.messages.batches
+        batches.create = AsyncMock(return_value=MagicMock(id="b1", processing_status="in_progress"))
+        batches.retrieve = AsyncMock(return_value=MagicMock(id="b1", processing_status="ended"))
+        batches.results = AsyncMock(return_value=_AsyncEntries([
+            _make_batch_entry("1", "second"),
+            _make_batch_entry("0", "first"),
+            _make_batch_entry("2"),
+        ]))
+
+        results = await ai_gen.generate_responses_batch(
+            [{"query": "a"}, {"query": "b", "conversation_history": "User: hi"}, {"query": "c"}],
+            poll_interval=0,
+        )
+
+        assert results == ["first", "second", None]
+        requests = batches.create.call_args[1]["requests"]
+        assert [r["custom_id"] for r in requests] == ["0", "1", "2"]
+        assert requests[0]["params"]["messages"] == [{"role": "user", "content": "a"}]
+        assert "tools" not in requests[0]["params"]
+        assert requests[1]["params"]["system"][1]["text"] == "Previous conversation:\nUser: hi"
+        batches.retrieve.assert_called_once_with("b1")
+        batches.results.assert_called_once_with("b1")
+
+    async def test_history_not_condensed_per_item(self, ai_gen):
+        batches = ai_gen.client.messages.batches
+        batches.create = AsyncMock(return_value=MagicMock(id="b1", processing_status="ended"))
+        batches.results = AsyncMock(return_value=_AsyncEntries([]))
+
+        await ai_gen.generate_responses_batch(
+            [{"query": "a", "conversation_history": "User: hi\nAssistant: hello"}]
+        )
+
+        ai_gen.client.messages.create.assert_not_called()
+        requests = batches.create.call_args[1]["requests"]
+        assert requests[0]["params"]["system"][1]["text"].endswith("User: hi\nAssistant: hello")
+
+    async def test_timeout_cancels_batch(self, ai_gen):
+        batches = ai_gen.client.messages.batches
+        batches.create = AsyncMock(return_value=MagicMock(id="b1", processing_status="in_progress"))
+        batches.retrieve = AsyncMock(return_value=MagicMock(id="b1", processing_status="in_progress"))
+        batches.cancel = AsyncMock()
+        batches.results = AsyncMock()
+
+        with pytest.raises(TimeoutError):
+            await ai_gen.generate_responses_batch([{"query": "a"}], poll_interval=0.01, timeout=0.05)
+
+        batches.cancel.assert_called_once_with("b1")
+        batches.results.assert_not_called()
+
+    async def test_failed_cancel_keeps_timeout_error(self, ai_gen):
+        batches = ai_gen.client.messages.batches
+        batches.create = AsyncMock(return_value=MagicMock(id="b1", processing_status="in_progress"))
+        batches.retrieve = AsyncMock(return_value=MagicMock(id="b1", processing_status="in_progress"))
+        batches.cancel = AsyncMock(side_effect=Exception("batch already ended"))
+
+        with pytest.raises(TimeoutError):
+            await ai_gen.generate_responses_batch([{"query": "a"}], poll_interval=0.01, timeout=0.05)
+
+        batches.cancel.assert_called_once_with("b1")
+
+    async def test_empty_items_skip_batch_api(self, ai_gen):
+        ai_gen.client.messages.batches.create = AsyncMock()
+
+        assert await ai_gen.generate_responses_batch([]) == []
+        ai_gen.client.messages.batches.create.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# Conversation history budget
+# ---------------------------------------------------------------------------
+
+class TestHistorySummary:
+    async def test_history_sent_verbatim(self, ai_gen):
+        ai_gen.client.messages.create.return_value = _make_response([_make_text_block("ok")])
+
+        await ai_gen.generate_response(query="q", conversation_history="User: hi")
+
+        assert ai_gen.client.messages.create.call_count == 1
+        system = ai_gen.client.messages.create.call_args[1]["system"]
+        assert system[1]["text"] == "Previous conversation:\nUser: hi"
+
+    async def test_summarize_uses_summary_model(self, ai_gen):
+        ai_gen.summary_model = "claude-summary"
+        ai_gen.client.messages.create.return_value = _make_response([_make_text_block("talked about a")])
+
+        summary = await ai_gen.summarize_history("User: a\nAssistant: b")
+
+        assert summary == "talked about a"
+        kwargs = ai_gen.client.messages.create.call_args[1]
+        assert kwargs["model"] == "claude-summary"
+        assert kwargs["messages"][0]["content"] == "User: a\nAssistant: b"
+
+    async def test_previous_summary_folded_in(self, ai_gen):
+        ai_gen.client.messages.create.return_value = _make_response([_make_text_block("a and c")])
+
+        await ai_gen.summarize_history("User: c", previous_summary="talked about a")
+
+        content = ai_gen.client.messages.create.call_args[1]["messages"][0]["content"]
+        assert content.startswith("Summary of earlier turns: talked about a")
+        assert content.endswith("User: c")
+
+    async def test_summary_failure_returns_none(self, ai_gen):
+        ai_gen.client.messages.create.side_effect = Exception("overloaded")
+
+        assert await ai_gen.summarize_history("User: a") is None
+
+
+# ---------------------------------------------------------------------------
+# generate_response_stream
+# ---------------------------------------------------------------------------
+
+class TestStreamingResponse:
+    async def test_yields_text_deltas(self, ai_gen):
+        final = _make_response([_make_text_block("Hello world")])
+        ai_gen.client.messages.stream = MagicMock(
+            return_value=_FakeStream(["Hello", " world"], final)
+        )
+
+        chunks = [c async for c in ai_gen.generate_response_stream(query="Hi")]
+
+        assert chunks == ["Hello", " world"]
+        call_kwargs = ai_gen.client.messages.stream.call_args[1]
+        assert call_kwargs["system"][0]["text"] == AIGenerator.SYSTEM_PROMPT
+
+    async def test_streams_follow_up_round_after_tool_use(self, ai_gen, mock_tool_manager):
+        tool_block = _make_tool_use_block("search_course_content", {"query": "ML"}, "t1")
+        first = _make_response([tool_block], stop_reason="tool_use")
+        final = _make_response([_make_text_block("Answer")])
+        ai_gen.client.messages.stream = MagicMock(side_effect=[
+            _FakeStream([], first),
+            _FakeStream(["Ans", "wer"], final),
+        ])
+
+        chunks = [c async for c in ai_gen.generate_response_stream(
+            query="q", tools=[{"name": "search_course_content"}], tool_manager=mock_tool_manager
+        )]
+
+        assert "".join(chunks) == "Answer"
+        mock_tool_manager.execute_tool.assert_called_once_with(
+            "search_course_content", query="ML"
+        )
+        second_call_kwargs = ai_gen.client.messages.stream.call_args_list[1][1]
+        assert second_call_kwargs["messages"][2]["content"][0]["tool_use_id"] == "t1"
+        assert "tools" in second_call_kwargs
+
+    async def test_final_round_omits_tools(self, ai_gen, mock_tool_manager):
+        resp1 = _make_response([_make_tool_use_block("a", {}, "t1")], stop_reason="tool_use")
+        resp2 = _make_response([_make_tool_use_block("b", {}, "t2")], stop_reason="tool_use")
+        final = _make_response([_make_text_block("done")])
+        ai_gen.client.messages.stream = MagicMock(side_effect=[
+            _FakeStream([], resp1),
+            _FakeStream([], resp2),
+            _FakeStream(["done"], final),
+        ])
+
+        chunks = [c async for c in ai_gen.generate_response_stream(
+            query="q", tools=[{"name": "a"}], tool_manager=mock_tool_manager
+        )]
+
+        assert chunks == ["done"]
+        assert ai_gen.client.messages.stream.call_count == 3
+        assert "tools" not in ai_gen.client.messages.stream.call_args_list[2][1]
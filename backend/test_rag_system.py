@@ -1,48 +1,86 @@
 """Tests for rag_system.py — RAGSystem orchestration, unit and integration tests."""
 
+import asyncio
 import os
 import pytest
-from unittest.mock import MagicMock, patch, call
-from rag_system import RAGSystem
-from models import Course, Lesson, CourseChunk
-from vector_store import SearchResults
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, call, create_autospec
+from models import Course, Lesson, CourseChunk, ToolResult
+
+# rag_system, search_tools and vector_store pull in chromadb and the Anthropic
+# SDK, so they are imported inside the fixtures and tests that need them
+# rather than at collection time.
 
 
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
 
-@pytest.fixture
-def mock_config():
-    cfg = MagicMock()
-    cfg.CHUNK_SIZE = 800
-    cfg.CHUNK_OVERLAP = 100
-    cfg.CHROMA_PATH = "/tmp/test_chroma"
-    cfg.EMBEDDING_MODEL = "all-MiniLM-L6-v2"
-    cfg.MAX_RESULTS = 5
-    cfg.ANTHROPIC_API_KEY = "test-key"
-    cfg.ANTHROPIC_MODEL = "claude-test"
-    cfg.MAX_HISTORY = 2
-    return cfg
+@pytest.fixture(scope="session")
+def mock_config(tmp_path_factory):
+    # Tests only read these attributes, so a plain namespace is enough
+    return SimpleNamespace(
+        CHUNK_SIZE=800,
+        CHUNK_OVERLAP=100,
+        # Per-worker directory so parallel xdist workers never share a Chroma path
+        CHROMA_PATH=str(tmp_path_factory.mktemp("chroma")),
+        EMBEDDING_MODEL="all-MiniLM-L6-v2",
+        MAX_RESULTS=5,
+        ANTHROPIC_API_KEY="test-key",
+        ANTHROPIC_MODEL="claude-test",
+        MAX_HISTORY=2,
+        MAX_HISTORY_TOKENS=1500,
+        SUMMARY_MODEL="claude-summary-test",
+        RESPONSE_CACHE_SIZE=16,
+        RESPONSE_CACHE_TTL=600,
+    )
+
+
+@pytest.fixture(scope="module", autouse=True)
+def _patch_rag_deps():
+    """Patch RAGSystem's heavy dependencies once for the whole module."""
+    import rag_system
+    from ai_generator import AIGenerator
+    from document_processor import DocumentProcessor
+    from session_manager import SessionManager
+    from vector_store import VectorStore
+
+    # VectorStore only gets spec, not spec_set: course_catalog is created in
+    # __init__, so tests that reach into it have to be able to assign it.
+    mocks = {
+        "DocumentProcessor": create_autospec(DocumentProcessor, spec_set=True),
+        "VectorStore": create_autospec(VectorStore),
+        "AIGenerator": create_autospec(AIGenerator, spec_set=True),
+        "SessionManager": create_autospec(SessionManager, spec_set=True),
+    }
+    with pytest.MonkeyPatch.context() as mp:
+        for name, mock_cls in mocks.items():
+            mp.setattr(rag_system, name, mock_cls)
+        yield mocks
 
 
 @pytest.fixture
-def rag(mock_config):
+def rag(mock_config, _patch_rag_deps):
     """Build a RAGSystem with all heavy dependencies mocked out."""
-    with patch("rag_system.DocumentProcessor") as MockDP, \
-         patch("rag_system.VectorStore") as MockVS, \
-         patch("rag_system.AIGenerator") as MockAI, \
-         patch("rag_system.SessionManager") as MockSM:
+    from rag_system import RAGSystem
 
-        system = RAGSystem(mock_config)
+    # Drop calls, return values and side effects left over from earlier tests
+    for mock_cls in _patch_rag_deps.values():
+        mock_cls.reset_mock(return_value=True, side_effect=True)
 
-        # Expose mocks for assertions
-        system._mock_dp = MockDP.return_value
-        system._mock_vs = MockVS.return_value
-        system._mock_ai = MockAI.return_value
-        system._mock_sm = MockSM.return_value
+    _patch_rag_deps["AIGenerator"].return_value.generate_response = AsyncMock()
+    _patch_rag_deps["AIGenerator"].return_value.summarize_history = AsyncMock()
+    # History within the token budget unless a test says otherwise
+    _patch_rag_deps["SessionManager"].return_value.get_messages_to_summarize.return_value = []
+    system = RAGSystem(mock_config)
 
-        yield system
+    # Expose mocks for assertions
+    system._mock_dp = _patch_rag_deps["DocumentProcessor"].return_value
+    system._mock_vs = _patch_rag_deps["VectorStore"].return_value
+    system._mock_ai = _patch_rag_deps["AIGenerator"].return_value
+    system._mock_sm = _patch_rag_deps["SessionManager"].return_value
+
+    return system
 
 
 # ---------------------------------------------------------------------------
@@ -67,22 +105,25 @@ class TestInit:
 # add_course_document
 # ---------------------------------------------------------------------------
 
-class TestAddCourseDocument:
-    def _make_course_and_chunks(self):
-        course = Course(
-            title="Test Course",
-            course_link="https://example.com",
-            instructor="Prof X",
-            lessons=[Lesson(lesson_number=1, title="Intro")],
-        )
-        chunks = [
-            CourseChunk(content="chunk1", course_title="Test Course", lesson_number=1, chunk_index=0),
-            CourseChunk(content="chunk2", course_title="Test Course", lesson_number=1, chunk_index=1),
-        ]
-        return course, chunks
+@pytest.fixture(scope="module")
+def course_and_chunks():
+    """A course with two chunks, shared by the module; tests must not mutate it."""
+    course = Course(
+        title="Test Course",
+        course_link="https://example.com",
+        instructor="Prof X",
+        lessons=[Lesson(lesson_number=1, title="Intro")],
+    )
+    chunks = (
+        CourseChunk(content="chunk1", course_title="Test Course", lesson_number=1, chunk_index=0),
+        CourseChunk(content="chunk2", course_title="Test Course", lesson_number=1, chunk_index=1),
+    )
+    return course, chunks
+
 
-    def test_successful_add(self, rag):
-        course, chunks = self._make_course_and_chunks()
+class TestAddCourseDocument:
+    def test_successful_add(self, rag, course_and_chunks):
+        course, chunks = course_and_chunks
         rag._mock_dp.process_course_document.return_value = (course, chunks)
 
         result_course, result_count = rag.add_course_document("/path/to/file.txt")
@@ -105,16 +146,24 @@ class TestAddCourseDocument:
 # add_course_folder
 # ---------------------------------------------------------------------------
 
+@pytest.fixture
+def fake_fs(monkeypatch):
+    """Install an in-memory folder listing for the os calls add_course_folder makes."""
+    def install(files):
+        monkeypatch.setattr(os, "listdir", lambda path: list(files))
+        monkeypatch.setattr(os.path, "isfile", lambda path: os.path.basename(path) in files)
+        monkeypatch.setattr(os.path, "exists", lambda path: True)
+    return install
+
+
 class TestAddCourseFolder:
     def test_nonexistent_folder(self, rag):
         courses, chunks = rag.add_course_folder("/does/not/exist")
         assert courses == 0
         assert chunks == 0
 
-    @patch("os.listdir", return_value=["course1.txt", "course2.txt", "readme.md"])
-    @patch("os.path.isfile", return_value=True)
-    @patch("os.path.exists", return_value=True)
-    def test_adds_new_courses_skips_existing(self, mock_exists, mock_isfile, mock_listdir, rag):
+    def test_adds_new_courses_skips_existing(self, rag, fake_fs):
+        fake_fs(["course1.txt", "course2.txt", "readme.md"])
         rag._mock_vs.get_existing_course_titles.return_value = ["Already Exists"]
 
         course_new = Course(title="New Course", lessons=[])
@@ -136,10 +185,8 @@ class TestAddCourseFolder:
         assert total_courses == 1
         assert total_chunks == 1
 
-    @patch("os.listdir", return_value=["course1.txt"])
-    @patch("os.path.isfile", return_value=True)
-    @patch("os.path.exists", return_value=True)
-    def test_clear_existing_flag(self, mock_exists, mock_isfile, mock_listdir, rag):
+    def test_clear_existing_flag(self, rag, fake_fs):
+        fake_fs(["course1.txt"])
         rag._mock_vs.get_existing_course_titles.return_value = []
         rag._mock_dp.process_course_document.return_value = (
             Course(title="C", lessons=[]),
@@ -149,10 +196,8 @@ class TestAddCourseFolder:
         rag.add_course_folder("/courses", clear_existing=True)
         rag._mock_vs.clear_all_data.assert_called_once()
 
-    @patch("os.listdir", return_value=["notes.pdf", "image.png"])
-    @patch("os.path.isfile", return_value=True)
-    @patch("os.path.exists", return_value=True)
-    def test_skips_non_supported_extensions(self, mock_exists, mock_isfile, mock_listdir, rag):
+    def test_skips_non_supported_extensions(self, rag, fake_fs):
+        fake_fs(["notes.pdf", "image.png"])
         rag._mock_vs.get_existing_course_titles.return_value = []
         rag._mock_dp.process_course_document.return_value = (
             Course(title="PDF Course", lessons=[]),
@@ -168,13 +213,19 @@ class TestAddCourseFolder:
 # query — unit tests
 # ---------------------------------------------------------------------------
 
+def _answer_with(text, sources):
+    """generate_response side effect that reports sources through the per-request collector"""
+    async def generate(**kwargs):
+        kwargs["tool_results"].append(ToolResult(text="hits", sources=sources))
+        return text
+    return generate
+
+
 class TestQuery:
-    def test_basic_query_no_session(self, rag):
+    async def test_basic_query_no_session(self, rag):
         rag._mock_ai.generate_response.return_value = "AI answer"
-        rag.tool_manager.get_last_sources = MagicMock(return_value=[])
-        rag.tool_manager.reset_sources = MagicMock()
 
-        response, sources = rag.query("What is ML?")
+        response, sources = await rag.query("What is ML?")
 
         assert response == "AI answer"
         assert sources == []
@@ -182,57 +233,214 @@ class TestQuery:
         # No session → no history lookup
         rag._mock_sm.get_conversation_history.assert_not_called()
 
-    def test_query_with_session(self, rag):
+    async def test_query_with_session(self, rag):
         rag._mock_ai.generate_response.return_value = "AI answer"
         rag._mock_sm.get_conversation_history.return_value = "User: hi\nAssistant: hello"
-        rag.tool_manager.get_last_sources = MagicMock(return_value=[])
-        rag.tool_manager.reset_sources = MagicMock()
 
-        response, sources = rag.query("Follow-up question", session_id="s1")
+        response, sources = await rag.query("Follow-up question", session_id="s1")
 
         rag._mock_sm.get_conversation_history.assert_called_once_with("s1")
         rag._mock_sm.add_exchange.assert_called_once_with(
             "s1", "Follow-up question", "AI answer"
         )
 
-    def test_query_passes_tools_to_ai(self, rag):
+    async def test_over_budget_history_folded_into_summary(self, rag):
+        from session_manager import Message
+
+        older = [Message("user", "old question"), Message("assistant", "old answer")]
+        rag._mock_sm.get_messages_to_summarize.return_value = older
+        rag._mock_sm.get_summary.return_value = "earlier summary"
+        rag._mock_ai.summarize_history.return_value = "new summary"
+        rag._mock_sm.get_conversation_history.return_value = "User: recent"
+        rag._mock_ai.generate_response.return_value = "AI answer"
+
+        await rag.query("Follow-up question", session_id="s1")
+
+        rag._mock_ai.summarize_history.assert_awaited_once()
+        assert rag._mock_ai.summarize_history.call_args[0][1] == "earlier summary"
+        rag._mock_sm.fold_into_summary.assert_called_once_with("s1", "new summary", older)
+
+    async def test_failed_summary_keeps_full_history(self, rag):
+        from session_manager import Message
+
+        rag._mock_sm.get_messages_to_summarize.return_value = [Message("user", "old question")]
+        rag._mock_ai.summarize_history.return_value = None
+        rag._mock_sm.get_conversation_history.return_value = "User: recent"
+        rag._mock_ai.generate_response.return_value = "AI answer"
+
+        await rag.query("Follow-up question", session_id="s1")
+
+        rag._mock_sm.fold_into_summary.assert_not_called()
+        rag._mock_sm.get_conversation_history.assert_called_once_with("s1")
+
+    async def test_query_passes_tools_to_ai(self, rag):
         rag._mock_ai.generate_response.return_value = "ok"
-        rag.tool_manager.get_last_sources = MagicMock(return_value=[])
-        rag.tool_manager.reset_sources = MagicMock()
 
-        rag.query("test")
+        await rag.query("test")
 
         call_kwargs = rag._mock_ai.generate_response.call_args[1]
         assert "tools" in call_kwargs
         assert call_kwargs["tool_manager"] is rag.tool_manager
 
-    def test_query_returns_sources_from_tools(self, rag):
-        rag._mock_ai.generate_response.return_value = "answer"
+    async def test_query_returns_sources_from_tools(self, rag):
         expected_sources = [{"label": "ML Course - Lesson 1", "link": "http://x"}]
-        rag.tool_manager.get_last_sources = MagicMock(return_value=expected_sources)
-        rag.tool_manager.reset_sources = MagicMock()
+        rag._mock_ai.generate_response.side_effect = _answer_with("answer", expected_sources)
 
-        _, sources = rag.query("question")
+        _, sources = await rag.query("question")
         assert sources == expected_sources
 
-    def test_query_resets_sources_after_retrieval(self, rag):
-        rag._mock_ai.generate_response.return_value = "answer"
-        rag.tool_manager.get_last_sources = MagicMock(return_value=[])
-        rag.tool_manager.reset_sources = MagicMock()
+    async def test_concurrent_queries_keep_their_own_sources(self, rag):
+        async def generate(query, tool_results, **kwargs):
+            # Yield to the other request between its tool call and its answer
+            tool_results.append(ToolResult(text="hits", sources=[{"label": query, "link": None}]))
+            await asyncio.sleep(0)
+            return query
+
+        rag._mock_ai.generate_response.side_effect = generate
 
-        rag.query("q")
-        rag.tool_manager.reset_sources.assert_called_once()
+        results = await asyncio.gather(rag.query("first"), rag.query("second"))
 
-    def test_query_prompt_includes_user_question(self, rag):
+        for response, sources in results:
+            assert sources == [{"label": response, "link": None}]
+
+    async def test_query_prompt_includes_user_question(self, rag):
         rag._mock_ai.generate_response.return_value = "ok"
-        rag.tool_manager.get_last_sources = MagicMock(return_value=[])
-        rag.tool_manager.reset_sources = MagicMock()
 
-        rag.query("How does backpropagation work?")
+        await rag.query("How does backpropagation work?")
 
         call_kwargs = rag._mock_ai.generate_response.call_args[1]
         assert "backpropagation" in call_kwargs["query"]
 
+    async def test_repeated_query_served_from_cache(self, rag):
+        expected_sources = [{"label": "ML Course - Lesson 1", "link": "http://x"}]
+        rag._mock_ai.generate_response.side_effect = _answer_with("answer", expected_sources)
+
+        first = await rag.query("What is ML?")
+        second = await rag.query("What is ML?")
+
+        assert first == second == ("answer", expected_sources)
+        rag._mock_ai.generate_response.assert_called_once()
+
+    async def test_answer_after_tool_error_not_cached(self, rag):
+        async def generate(tool_results, **kwargs):
+            tool_results.append(ToolResult(text="Search error: timeout", error=True))
+            return "Sorry, the search failed"
+
+        rag._mock_ai.generate_response.side_effect = generate
+
+        await rag.query("What is ML?")
+        await rag.query("What is ML?")
+
+        assert rag._mock_ai.generate_response.call_count == 2
+
+    async def test_different_history_misses_cache(self, rag):
+        rag._mock_ai.generate_response.return_value = "answer"
+        rag._mock_sm.get_conversation_history.side_effect = ["User: a", "User: b"]
+
+        await rag.query("q", session_id="s1")
+        await rag.query("q", session_id="s1")
+
+        assert rag._mock_ai.generate_response.call_count == 2
+
+    async def test_adding_course_invalidates_cache(self, rag):
+        rag._mock_ai.generate_response.return_value = "answer"
+        rag._mock_dp.process_course_document.return_value = (Course(title="C", lessons=[]), [])
+
+        await rag.query("q")
+        rag.add_course_document("/path/to/file.txt")
+        await rag.query("q")
+
+        assert rag._mock_ai.generate_response.call_count == 2
+
+
+# ---------------------------------------------------------------------------
+# query_stream
+# ---------------------------------------------------------------------------
+
+class TestQueryStream:
+    async def test_streams_deltas_then_sources(self, rag):
+        expected_sources = [{"label": "ML Course - Lesson 1", "link": "http://x"}]
+
+        async def fake_stream(tool_results, **kwargs):
+            tool_results.append(ToolResult(text="hits", sources=expected_sources))
+            for text in ("AI ", "answer"):
+                yield text
+
+        rag._mock_ai.generate_response_stream = MagicMock(side_effect=fake_stream)
+        rag._mock_sm.get_conversation_history.return_value = None
+
+        events = [e async for e in rag.query_stream("What is ML?", session_id="s1")]
+
+        assert events == [
+            {"type": "delta", "text": "AI "},
+            {"type": "delta", "text": "answer"},
+            {"type": "sources", "sources": expected_sources},
+        ]
+        rag._mock_sm.add_exchange.assert_called_once_with("s1", "What is ML?", "AI answer")
+
+
+    async def test_only_final_round_text_recorded(self, rag):
+        async def fake_stream(tool_results, **kwargs):
+            yield "Let me search. "
+            tool_results.append(ToolResult(text="hits"))
+            yield "ML is "
+            yield "learning from data"
+
+        rag._mock_ai.generate_response_stream = MagicMock(side_effect=fake_stream)
+        rag._mock_sm.get_conversation_history.return_value = None
+
+        events = [e async for e in rag.query_stream("What is ML?", session_id="s1")]
+
+        assert events[0] == {"type": "delta", "text": "Let me search. "}
+        rag._mock_sm.add_exchange.assert_called_once_with("s1", "What is ML?", "ML is learning from data")
+        assert await rag.query("What is ML?") == ("ML is learning from data", [])
+
+    async def test_preamble_dropped_when_final_round_has_no_text(self, rag):
+        async def fake_stream(tool_results, **kwargs):
+            yield "Let me search. "
+            tool_results.append(ToolResult(text="hits"))
+
+        rag._mock_ai.generate_response_stream = MagicMock(side_effect=fake_stream)
+        rag._mock_sm.get_conversation_history.return_value = None
+
+        [e async for e in rag.query_stream("What is ML?", session_id="s1")]
+
+        rag._mock_sm.add_exchange.assert_called_once_with("s1", "What is ML?", "")
+        [e async for e in rag.query_stream("What is ML?", session_id="s1")]
+        assert rag._mock_ai.generate_response_stream.call_count == 2
+
+    async def test_disconnect_closes_model_stream(self, rag):
+        closed = asyncio.Event()
+
+        async def fake_stream(**kwargs):
+            try:
+                yield "AI "
+                yield "answer"
+            finally:
+                closed.set()
+
+        rag._mock_ai.generate_response_stream = MagicMock(side_effect=fake_stream)
+        rag._mock_sm.get_conversation_history.return_value = None
+
+        events = rag.query_stream("What is ML?", session_id="s1")
+        assert await anext(events) == {"type": "delta", "text": "AI "}
+        await events.aclose()
+
+        assert closed.is_set()
+        rag._mock_sm.add_exchange.assert_not_called()
+
+    async def test_answer_after_tool_error_not_cached(self, rag):
+        async def fake_stream(tool_results, **kwargs):
+            tool_results.append(ToolResult(text="Search error: timeout", error=True))
+            yield "Sorry"
+
+        rag._mock_ai.generate_response_stream = MagicMock(side_effect=fake_stream)
+
+        for _ in range(2):
+            [e async for e in rag.query_stream("What is ML?")]
+
+        assert rag._mock_ai.generate_response_stream.call_count == 2
+
 
 # ---------------------------------------------------------------------------
 # get_course_analytics
@@ -253,6 +461,60 @@ class TestGetCourseAnalytics:
 # Integration-style tests (mocking only the external boundaries)
 # ---------------------------------------------------------------------------
 
+# Each scenario pairs a setup step, which primes the mocked VectorStore, with
+# the tool call to run through the real ToolManager and the fragments
+# expected in its output.
+
+def _search_hit(store):
+    from vector_store import SearchResults
+
+    store.search.return_value = SearchResults(
+        documents=["relevant content"],
+        metadata=[{"course_title": "ML101", "lesson_number": 1}],
+        distances=[0.1],
+    )
+    store.get_lesson_link.return_value = "http://link"
+
+
+def _search_empty(store):
+    from vector_store import SearchResults
+
+    store.search.return_value = SearchResults(documents=[], metadata=[], distances=[])
+
+
+def _search_error(store):
+    from vector_store import SearchResults
+
+    store.search.return_value = SearchResults.empty("Search error: connection refused")
+
+
+def _outline_ok(store):
+    store._resolve_course_name.return_value = "Deep Learning"
+    store.course_catalog = SimpleNamespace(get=lambda ids=None, **kw: {
+        "metadatas": [{
+            "title": "Deep Learning",
+            "course_link": "https://dl.com",
+            "lessons_json": '[{"lesson_number":1,"lesson_title":"Intro","lesson_link":"http://1"}]',
+            "lesson_count": 1,
+        }],
+        "ids": ["Deep Learning"],
+    })
+
+
+PIPELINE_SCENARIOS = [
+    pytest.param(_search_hit, "search_course_content", {"query": "neural networks"},
+                 ["ML101", "relevant content"], id="search_hit"),
+    pytest.param(_search_empty, "search_course_content", {"query": "quantum computing"},
+                 ["No relevant content found"], id="search_empty"),
+    pytest.param(_search_error, "search_course_content", {"query": "anything"},
+                 ["connection refused"], id="search_error"),
+    pytest.param(_outline_ok, "get_course_outline", {"course_name": "DL"},
+                 ["Course: Deep Learning", "Lesson 1: Intro"], id="outline_ok"),
+    pytest.param(lambda store: None, "fake_tool", {"param": "x"},
+                 ["not found"], id="unknown_tool"),
+]
+
+
 class TestIntegration:
     """
     These tests exercise the full query pipeline through RAGSystem → ToolManager
@@ -260,26 +522,20 @@ class TestIntegration:
     together correctly.
     """
 
-    def test_search_tool_called_through_pipeline(self, rag):
-        """Verify that when AI requests a tool, the pipeline executes it."""
-        # Set up the vector store mock (used by the real CourseSearchTool)
-        rag.vector_store.search.return_value = SearchResults(
-            documents=["relevant content"],
-            metadata=[{"course_title": "ML101", "lesson_number": 1}],
-            distances=[0.1],
-        )
-        rag.vector_store.get_lesson_link.return_value = "http://link"
+    pytestmark = [pytest.mark.integration, pytest.mark.xdist_group(name="integration")]
 
-        # Execute the search tool directly through the tool_manager
-        result = rag.tool_manager.execute_tool(
-            "search_course_content", query="neural networks"
-        )
+    @pytest.mark.parametrize("setup,tool_name,tool_kwargs,expected", PIPELINE_SCENARIOS)
+    async def test_pipeline(self, rag, setup, tool_name, tool_kwargs, expected):
+        setup(rag.vector_store)
+
+        result = await rag.tool_manager.execute_tool(tool_name, **tool_kwargs)
+
+        assert all(fragment in result.text for fragment in expected), (result, expected)
 
-        assert "ML101" in result
-        assert "relevant content" in result
+    async def test_sources_flow_through_pipeline(self, rag):
+        """Sources found by the search tool should come back with its result."""
+        from vector_store import SearchResults
 
-    def test_sources_flow_through_pipeline(self, rag):
-        """Sources set by search tool should be retrievable via tool_manager."""
         rag.vector_store.search.return_value = SearchResults(
             documents=["doc"],
             metadata=[{"course_title": "DL", "lesson_number": 3}],
@@ -287,59 +543,9 @@ class TestIntegration:
         )
         rag.vector_store.get_lesson_link.return_value = "http://dl/3"
 
-        rag.tool_manager.execute_tool("search_course_content", query="CNN")
+        result = await rag.tool_manager.execute_tool("search_course_content", query="CNN")
 
-        sources = rag.tool_manager.get_last_sources()
+        sources = result.sources
         assert len(sources) == 1
         assert sources[0]["label"] == "DL - Lesson 3"
         assert sources[0]["link"] == "http://dl/3"
-
-        # Reset and verify
-        rag.tool_manager.reset_sources()
-        assert rag.tool_manager.get_last_sources() == []
-
-    def test_outline_tool_through_pipeline(self, rag):
-        """Verify outline tool works end-to-end through the tool_manager."""
-        rag.vector_store._resolve_course_name.return_value = "Deep Learning"
-        rag.vector_store.course_catalog.get.return_value = {
-            "metadatas": [{
-                "title": "Deep Learning",
-                "course_link": "https://dl.com",
-                "lessons_json": '[{"lesson_number":1,"lesson_title":"Intro","lesson_link":"http://1"}]',
-                "lesson_count": 1,
-            }],
-            "ids": ["Deep Learning"],
-        }
-
-        result = rag.tool_manager.execute_tool(
-            "get_course_outline", course_name="DL"
-        )
-
-        assert "Course: Deep Learning" in result
-        assert "Lesson 1: Intro" in result
-
-    def test_unknown_tool_handled_gracefully(self, rag):
-        result = rag.tool_manager.execute_tool("fake_tool", param="x")
-        assert "not found" in result
-
-    def test_search_with_no_results(self, rag):
-        """Empty vector store results should produce a clear message."""
-        rag.vector_store.search.return_value = SearchResults(
-            documents=[], metadata=[], distances=[]
-        )
-
-        result = rag.tool_manager.execute_tool(
-            "search_course_content", query="quantum computing"
-        )
-        assert "No relevant content found" in result
-
-    def test_search_with_error(self, rag):
-        """Vector store error should propagate as a readable string."""
-        rag.vector_store.search.return_value = SearchResults.empty(
-            "Search error: connection refused"
-        )
-
-        result = rag.tool_manager.execute_tool(
-            "search_course_content", query="anything"
-        )
-        assert "connection refused" in result
@@ -0,0 +1,52 @@
+"""Tests for response_cache.py — ResponseCache TTL/LRU behaviour."""
+
+import response_cache
+from response_cache import ResponseCache
+
+
+class TestResponseCache:
+    def test_get_returns_stored_value(self):
+        cache = ResponseCache(maxsize=4, ttl=60)
+        key = ResponseCache.make_key("q", None, "tools")
+        cache.set(key, ("answer", []))
+        assert cache.get(key) == ("answer", [])
+
+    def test_missing_key_returns_none(self):
+        cache = ResponseCache(maxsize=4, ttl=60)
+        assert cache.get(ResponseCache.make_key("q")) is None
+
+    def test_key_parts_are_separated(self):
+        assert ResponseCache.make_key("ab", "c") != ResponseCache.make_key("a", "bc")
+        assert ResponseCache.make_key("q", None) == ResponseCache.make_key("q", "")
+
+    def test_expired_entry_is_dropped(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+        cache = ResponseCache(maxsize=4, ttl=10)
+        cache.set(b"k", "v")
+
+        now[0] += 11
+        assert cache.get(b"k") is None
+        assert len(cache) == 0
+
+    def test_least_recently_used_entry_evicted(self):
+        cache = ResponseCache(maxsize=2, ttl=60)
+        cache.set(b"a", 1)
+        cache.set(b"b", 2)
+        cache.get(b"a")  # "b" is now least recently used
+        cache.set(b"c", 3)
+
+        assert cache.get(b"a") == 1
+        assert cache.get(b"b") is None
+        assert cache.get(b"c") == 3
+
+    def test_zero_size_disables_caching(self):
+        cache = ResponseCache(maxsize=0, ttl=60)
+        cache.set(b"k", "v")
+        assert cache.get(b"k") is None
+
+    def test_clear(self):
+        cache = ResponseCache(maxsize=4, ttl=60)
+        cache.set(b"k", "v")
+        cache.clear()
+        assert len(cache) == 0
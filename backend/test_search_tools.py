@@ -1,49 +1,114 @@
 """Tests for search_tools.py — CourseSearchTool, CourseOutlineTool, and ToolManager."""
 
+import asyncio
 import pytest
-from unittest.mock import MagicMock, patch
-from search_tools import CourseSearchTool, CourseOutlineTool, ToolManager, Tool
+from types import MappingProxyType, SimpleNamespace
+from unittest.mock import MagicMock, Mock
+from search_tools import CourseSearchTool, CourseOutlineTool, ToolManager, Tool, _parse_lessons
 from vector_store import SearchResults
+from models import ToolResult
+
+
+def _contains_all(hay: str, *needles: str):
+    """Assert every needle occurs in hay, reporting all of them on failure."""
+    assert all(n in hay for n in needles), (hay, needles)
 
 
 # ---------------------------------------------------------------------------
 # Fixtures
 # ---------------------------------------------------------------------------
 
-@pytest.fixture
-def mock_vector_store():
-    """Create a mock VectorStore with sensible defaults."""
-    store = MagicMock()
-    store.search.return_value = SearchResults(
+# Shared SearchResults are built once per module; metadata is wrapped in
+# MappingProxyType so no test can mutate state another test relies on.
+
+@pytest.fixture(scope="module")
+def ml_search_results():
+    return SearchResults(
         documents=["chunk text about ML"],
-        metadata=[{"course_title": "Intro to ML", "lesson_number": 2}],
+        metadata=[MappingProxyType({"course_title": "Intro to ML", "lesson_number": 2})],
         distances=[0.15],
     )
-    store.get_lesson_link.return_value = "https://example.com/ml/lesson2"
-    store._resolve_course_name.return_value = "Intro to ML"
-    store.course_catalog.get.return_value = {
-        "metadatas": [{
-            "title": "Intro to ML",
-            "course_link": "https://example.com/ml",
-            "lessons_json": '[{"lesson_number":1,"lesson_title":"Basics","lesson_link":"https://example.com/ml/1"},{"lesson_number":2,"lesson_title":"Advanced","lesson_link":"https://example.com/ml/2"}]',
-            "lesson_count": 2,
-        }],
-        "ids": ["Intro to ML"],
-    }
-    return store
-
-
-@pytest.fixture
+
+
+@pytest.fixture(scope="module")
+def empty_search_results():
+    return SearchResults(documents=[], metadata=[], distances=[])
+
+
+@pytest.fixture(scope="module")
+def two_search_results():
+    return SearchResults(
+        documents=["doc1", "doc2"],
+        metadata=[
+            MappingProxyType({"course_title": "A", "lesson_number": 1}),
+            MappingProxyType({"course_title": "B", "lesson_number": None}),
+        ],
+        distances=[0.1, 0.2],
+    )
+
+
+@pytest.fixture(scope="module")
+def timeout_search_results():
+    return SearchResults.empty("Search error: timeout")
+
+
+class FakeVectorStore:
+    """
+    Minimal VectorStore double exposing only what the tools touch.
+
+    Methods are plain Mocks (no magic-method setup) so tests can still set
+    return values and assert on calls. One instance is shared per module;
+    reset() restores the defaults between tests.
+    """
+
+    def __init__(self, search_results: SearchResults):
+        self._search_results = search_results
+        self.search = Mock()
+        self.get_lesson_link = Mock()
+        self._resolve_course_name = Mock()
+        self.course_catalog = SimpleNamespace(get=Mock())
+        self.reset()
+
+    def reset(self):
+        """Forget recorded calls and restore the default return values."""
+        for method in (self.search, self.get_lesson_link,
+                       self._resolve_course_name, self.course_catalog.get):
+            method.reset_mock(return_value=True, side_effect=True)
+
+        self.search.return_value = self._search_results
+        self.get_lesson_link.return_value = "https://example.com/ml/lesson2"
+        self._resolve_course_name.return_value = "Intro to ML"
+        self.course_catalog.get.return_value = {
+            "metadatas": [{
+                "title": "Intro to ML",
+                "course_link": "https://example.com/ml",
+                "lessons_json": '[{"lesson_number":1,"lesson_title":"Basics","lesson_link":"https://example.com/ml/1"},{"lesson_number":2,"lesson_title":"Advanced","lesson_link":"https://example.com/ml/2"}]',
+                "lesson_count": 2,
+            }],
+            "ids": ["Intro to ML"],
+        }
+
+
+# The store, tools and manager are built once per module. Only the store keeps
+# state between tests, and _reset_shared_state restores it after every test.
+
+@pytest.fixture(scope="module")
+def mock_vector_store(ml_search_results):
+    """Create a fake VectorStore with sensible defaults."""
+    return FakeVectorStore(ml_search_results)
+
+
+@pytest.fixture(scope="module")
 def search_tool(mock_vector_store):
     return CourseSearchTool(mock_vector_store)
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def outline_tool(mock_vector_store):
     return CourseOutlineTool(mock_vector_store)
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def tool_manager(search_tool, outline_tool):
     tm = ToolManager()
     tm.register_tool(search_tool)
@@ -51,22 +116,51 @@ def tool_manager(search_tool, outline_tool):
     return tm
 
 
+@pytest.fixture(autouse=True)
+def _reset_shared_state(mock_vector_store):
+    yield
+    mock_vector_store.reset()
+
+
+# ---------------------------------------------------------------------------
+# Tool definitions
+# ---------------------------------------------------------------------------
+
+@pytest.mark.parametrize("tool_fixture,name,required", [
+    ("search_tool", "search_course_content", ["query"]),
+    ("outline_tool", "get_course_outline", ["course_name"]),
+])
+def test_tool_definition(request, tool_fixture, name, required):
+    defn = request.getfixturevalue(tool_fixture).get_tool_definition()
+    assert defn["name"] == name
+    assert set(required) <= defn["input_schema"]["properties"].keys()
+    assert defn["input_schema"]["required"] == required
+
+
 # ---------------------------------------------------------------------------
 # CourseSearchTool — unit tests
 # ---------------------------------------------------------------------------
 
 class TestCourseSearchTool:
-    def test_tool_definition_has_required_fields(self, search_tool):
-        defn = search_tool.get_tool_definition()
-        assert defn["name"] == "search_course_content"
-        assert "input_schema" in defn
-        assert "query" in defn["input_schema"]["properties"]
-        assert defn["input_schema"]["required"] == ["query"]
-
-    def test_execute_returns_formatted_results(self, search_tool, mock_vector_store):
-        result = search_tool.execute(query="machine learning")
-        assert "[Intro to ML - Lesson 2]" in result
-        assert "chunk text about ML" in result
+    @pytest.mark.parametrize("results_fixture,kwargs,expected,sources_len", [
+        ("ml_search_results", {"query": "machine learning"},
+         ["[Intro to ML - Lesson 2]", "chunk text about ML"], 1),
+        ("empty_search_results", {"query": "nonexistent topic"},
+         ["No relevant content found"], 0),
+        ("empty_search_results", {"query": "x", "course_name": "Physics", "lesson_number": 5},
+         ["Physics", "lesson 5"], 0),
+        ("two_search_results", {"query": "test"},
+         ["[A - Lesson 1]", "[B]"], 2),
+    ], ids=["formatted", "empty", "empty-with-filters", "multiple"])
+    def test_execute_output(self, request, search_tool, mock_vector_store,
+                            results_fixture, kwargs, expected, sources_len):
+        mock_vector_store.search.return_value = request.getfixturevalue(results_fixture)
+        result = search_tool.run(**kwargs)
+        _contains_all(result.text, *expected)
+        assert len(result.sources) == sources_len
+
+    def test_execute_searches_without_filters_by_default(self, search_tool, mock_vector_store):
+        search_tool.execute(query="machine learning")
         mock_vector_store.search.assert_called_once_with(
             query="machine learning", course_name=None, lesson_number=None
         )
@@ -77,33 +171,17 @@ class TestCourseSearchTool:
             query="neural nets", course_name="ML", lesson_number=3
         )
 
-    def test_execute_empty_results(self, search_tool, mock_vector_store):
-        mock_vector_store.search.return_value = SearchResults(
-            documents=[], metadata=[], distances=[]
-        )
-        result = search_tool.execute(query="nonexistent topic")
-        assert "No relevant content found" in result
-
-    def test_execute_empty_results_with_filters(self, search_tool, mock_vector_store):
-        mock_vector_store.search.return_value = SearchResults(
-            documents=[], metadata=[], distances=[]
-        )
-        result = search_tool.execute(
-            query="x", course_name="Physics", lesson_number=5
-        )
-        assert "Physics" in result
-        assert "lesson 5" in result
-
-    def test_execute_error_from_store(self, search_tool, mock_vector_store):
-        mock_vector_store.search.return_value = SearchResults.empty("Search error: timeout")
+    def test_execute_error_from_store(self, search_tool, mock_vector_store, timeout_search_results):
+        mock_vector_store.search.return_value = timeout_search_results
         result = search_tool.execute(query="anything")
         assert result == "Search error: timeout"
+        assert search_tool.run(query="anything").error
 
-    def test_last_sources_tracked(self, search_tool):
-        search_tool.execute(query="ML basics")
-        assert len(search_tool.last_sources) == 1
-        assert search_tool.last_sources[0]["label"] == "Intro to ML - Lesson 2"
-        assert search_tool.last_sources[0]["link"] == "https://example.com/ml/lesson2"
+    def test_sources_returned_with_result(self, search_tool):
+        sources = search_tool.run(query="ML basics").sources
+        assert len(sources) == 1
+        assert sources[0]["label"] == "Intro to ML - Lesson 2"
+        assert sources[0]["link"] == "https://example.com/ml/lesson2"
 
     def test_sources_without_lesson_number(self, search_tool, mock_vector_store):
         mock_vector_store.search.return_value = SearchResults(
@@ -111,44 +189,26 @@ class TestCourseSearchTool:
             metadata=[{"course_title": "Intro to ML", "lesson_number": None}],
             distances=[0.1],
         )
-        search_tool.execute(query="overview")
-        src = search_tool.last_sources[0]
+        src = search_tool.run(query="overview").sources[0]
         assert src["label"] == "Intro to ML"
         assert src["link"] is None
 
-    def test_multiple_results_formatted(self, search_tool, mock_vector_store):
-        mock_vector_store.search.return_value = SearchResults(
-            documents=["doc1", "doc2"],
-            metadata=[
-                {"course_title": "A", "lesson_number": 1},
-                {"course_title": "B", "lesson_number": None},
-            ],
-            distances=[0.1, 0.2],
-        )
-        result = search_tool.execute(query="test")
-        assert "[A - Lesson 1]" in result
-        assert "[B]" in result
-        assert len(search_tool.last_sources) == 2
-
 
 # ---------------------------------------------------------------------------
 # CourseOutlineTool — unit tests
 # ---------------------------------------------------------------------------
 
 class TestCourseOutlineTool:
-    def test_tool_definition(self, outline_tool):
-        defn = outline_tool.get_tool_definition()
-        assert defn["name"] == "get_course_outline"
-        assert "course_name" in defn["input_schema"]["properties"]
-        assert defn["input_schema"]["required"] == ["course_name"]
-
     def test_execute_returns_formatted_outline(self, outline_tool):
         result = outline_tool.execute(course_name="ML")
-        assert "Course: Intro to ML" in result
-        assert "Course Link: https://example.com/ml" in result
-        assert "Total Lessons: 2" in result
-        assert "Lesson 1: Basics" in result
-        assert "Lesson 2: Advanced" in result
+        _contains_all(
+            result,
+            "Course: Intro to ML",
+            "Course Link: https://example.com/ml",
+            "Total Lessons: 2",
+            "Lesson 1: Basics",
+            "Lesson 2: Advanced",
+        )
 
     def test_execute_no_matching_course(self, outline_tool, mock_vector_store):
         mock_vector_store._resolve_course_name.return_value = None
@@ -172,8 +232,21 @@ class TestCourseOutlineTool:
     def test_execute_handles_exception(self, outline_tool, mock_vector_store):
         mock_vector_store._resolve_course_name.return_value = "Some Course"
         mock_vector_store.course_catalog.get.side_effect = Exception("DB error")
-        result = outline_tool.execute(course_name="ML")
-        assert "Error retrieving course outline" in result
+        result = outline_tool.run(course_name="ML")
+        assert "Error retrieving course outline" in result.text
+        assert result.error
+
+    def test_repeated_outline_reuses_parsed_lessons(self, outline_tool):
+        outline_tool.execute(course_name="ML")
+        hits = _parse_lessons.cache_info().hits
+        outline_tool.execute(course_name="ML")
+        assert _parse_lessons.cache_info().hits == hits + 1
+
+    def test_parsed_lessons_are_read_only(self):
+        lessons = _parse_lessons('[{"lesson_number": 1, "lesson_title": "Intro"}]')
+        with pytest.raises(TypeError):
+            lessons[0]["lesson_title"] = "Changed"
+        assert _parse_lessons('[{"lesson_number": 1, "lesson_title": "Intro"}]')[0]["lesson_title"] == "Intro"
 
 
 # ---------------------------------------------------------------------------
@@ -187,6 +260,21 @@ class TestToolManager:
         assert "search_course_content" in names
         assert "get_course_outline" in names
 
+    def test_definitions_cached_until_next_registration(self, search_tool, outline_tool):
+        # Own manager, so the extra registration doesn't leak into the shared one
+        tm = ToolManager()
+        tm.register_tool(search_tool)
+        tm.register_tool(outline_tool)
+        first = tm.get_tool_definitions()
+        assert tm.get_tool_definitions() is first
+
+        extra_tool = MagicMock(spec=Tool)
+        extra_tool.get_tool_definition.return_value = {"name": "extra_tool"}
+        tm.register_tool(extra_tool)
+
+        names = [d["name"] for d in tm.get_tool_definitions()]
+        assert names == ["search_course_content", "get_course_outline", "extra_tool"]
+
     def test_register_tool_without_name_raises(self):
         bad_tool = MagicMock(spec=Tool)
         bad_tool.get_tool_definition.return_value = {"description": "no name"}
@@ -194,28 +282,30 @@ class TestToolManager:
         with pytest.raises(ValueError, match="must have a 'name'"):
             tm.register_tool(bad_tool)
 
-    def test_execute_registered_tool(self, tool_manager, mock_vector_store):
-        result = tool_manager.execute_tool("search_course_content", query="test")
-        assert isinstance(result, str)
-
-    def test_execute_unknown_tool(self, tool_manager):
-        result = tool_manager.execute_tool("nonexistent_tool", query="x")
-        assert "not found" in result
-
-    def test_get_last_sources(self, tool_manager, search_tool):
-        search_tool.last_sources = [{"label": "src", "link": None}]
-        assert tool_manager.get_last_sources() == [{"label": "src", "link": None}]
+    async def test_execute_registered_tool(self, tool_manager, mock_vector_store):
+        result = await tool_manager.execute_tool("search_course_content", query="test")
+        assert isinstance(result, ToolResult)
+        assert result.sources == [{"label": "Intro to ML - Lesson 2", "link": "https://example.com/ml/lesson2"}]
 
-    def test_get_last_sources_empty(self, tool_manager):
-        assert tool_manager.get_last_sources() == []
+    async def test_execute_unknown_tool(self, tool_manager):
+        result = await tool_manager.execute_tool("nonexistent_tool", query="x")
+        assert "not found" in result.text
+        assert result.error
 
-    def test_reset_sources(self, tool_manager, search_tool):
-        search_tool.last_sources = [{"label": "x", "link": None}]
-        tool_manager.reset_sources()
-        assert search_tool.last_sources == []
+    async def test_concurrent_calls_keep_their_own_sources(self, tool_manager, mock_vector_store,
+                                                           ml_search_results, two_search_results):
+        mock_vector_store.search.side_effect = lambda query, **_: (
+            ml_search_results if query == "ml" else two_search_results
+        )
+        ml, two = await asyncio.gather(
+            tool_manager.execute_tool("search_course_content", query="ml"),
+            tool_manager.execute_tool("search_course_content", query="two"),
+        )
+        assert [s["label"] for s in ml.sources] == ["Intro to ML - Lesson 2"]
+        assert len(two.sources) == 2
 
-    def test_execute_passes_kwargs(self, tool_manager, mock_vector_store):
-        tool_manager.execute_tool(
+    async def test_execute_passes_kwargs(self, tool_manager, mock_vector_store):
+        await tool_manager.execute_tool(
             "search_course_content",
             query="q", course_name="C", lesson_number=1,
         )
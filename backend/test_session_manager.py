@@ -0,0 +1,98 @@
+"""Tests for session_manager.py — SessionManager history and rolling summaries."""
+
+from config import config
+from session_manager import SessionManager
+
+
+def _session(max_history_tokens=10, exchanges=2):
+    manager = SessionManager(max_history=5, max_history_tokens=max_history_tokens)
+    session_id = manager.create_session()
+    for i in range(exchanges):
+        manager.add_exchange(session_id, f"question {i} " + "q" * 40, f"answer {i} " + "a" * 40)
+    return manager, session_id
+
+
+class TestRollingSummary:
+    def test_within_budget_nothing_to_summarize(self):
+        manager, session_id = _session(max_history_tokens=1000)
+        assert manager.get_messages_to_summarize(session_id) == []
+
+    def test_no_budget_nothing_to_summarize(self):
+        manager, session_id = _session(max_history_tokens=None)
+        assert manager.get_messages_to_summarize(session_id) == []
+
+    def test_over_budget_returns_all_but_recent(self):
+        manager, session_id = _session()
+        older = manager.get_messages_to_summarize(session_id)
+        assert [m.content[:10] for m in older] == ["question 0", "answer 0 a"]
+
+    def test_fold_replaces_older_turns_with_summary(self):
+        manager, session_id = _session()
+        manager.fold_into_summary(session_id, "talked about 0", manager.get_messages_to_summarize(session_id))
+
+        history = manager.get_conversation_history(session_id)
+        assert history.startswith("Summary of earlier turns: talked about 0\nUser: question 1")
+        assert "question 0" not in history
+        assert manager.get_summary(session_id) == "talked about 0"
+
+    def test_next_fold_only_covers_new_turns(self):
+        manager, session_id = _session()
+        manager.fold_into_summary(session_id, "talked about 0", manager.get_messages_to_summarize(session_id))
+        manager.add_exchange(session_id, "question 2 " + "q" * 40, "answer 2")
+
+        older = manager.get_messages_to_summarize(session_id)
+        assert [m.content[:10] for m in older] == ["question 1", "answer 1 a"]
+
+    def test_stale_fold_ignored(self):
+        manager, session_id = _session()
+        older = manager.get_messages_to_summarize(session_id)
+        manager.fold_into_summary(session_id, "first", older)
+        # A concurrent request folding the same turns must not drop newer ones
+        manager.fold_into_summary(session_id, "second", older)
+
+        assert manager.get_summary(session_id) == "first"
+        assert len(manager.sessions[session_id]) == 2
+
+    def test_delete_session_drops_summary(self):
+        manager, session_id = _session()
+        manager.fold_into_summary(session_id, "talked about 0", manager.get_messages_to_summarize(session_id))
+
+        manager.delete_session(session_id)
+
+        assert manager.get_summary(session_id) is None
+        assert manager.get_conversation_history(session_id) is None
+
+    def test_clear_session_drops_summary(self):
+        manager, session_id = _session()
+        manager.fold_into_summary(session_id, "talked about 0", manager.get_messages_to_summarize(session_id))
+
+        manager.clear_session(session_id)
+
+        assert manager.get_conversation_history(session_id) is None
+
+
+class TestShippedConfig:
+    """Rolling summaries with the session limits the app actually runs with."""
+
+    def test_turns_past_window_folded_not_dropped(self):
+        manager = SessionManager(config.MAX_HISTORY, config.MAX_HISTORY_TOKENS)
+        session_id = manager.create_session()
+        for i in range(3):
+            manager.add_exchange(session_id, f"q{i} " + "q" * 1000, f"a{i} " + "a" * 1000)
+
+        older = manager.get_messages_to_summarize(session_id)
+        assert [m.content[:2] for m in older] == ["q0", "a0"]
+
+        manager.fold_into_summary(session_id, "asked q0", older)
+        history = manager.get_conversation_history(session_id)
+        assert history.startswith("Summary of earlier turns: asked q0\nUser: q1")
+        assert manager.get_messages_to_summarize(session_id) == []
+
+    def test_count_cap_without_token_budget(self):
+        manager = SessionManager(config.MAX_HISTORY)
+        session_id = manager.create_session()
+        for i in range(3):
+            manager.add_exchange(session_id, f"q{i}", f"a{i}")
+
+        assert [m.content for m in manager.sessions[session_id]] == ["q1", "a1", "q2", "a2"]
+        assert manager.get_messages_to_summarize(session_id) == []
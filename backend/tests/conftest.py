@@ -1,154 +1,317 @@
-"""
-Shared fixtures for the RAG chatbot test suite.
-
-The production app.py mounts StaticFiles from ../frontend at startup, which
-won't exist in the test environment. To avoid that import-time side effect we
-build a lightweight test app here that declares the same API routes and uses
-the same request/response models, but with a mocked RAGSystem injected via
-dependency override.
-"""
-
-import pytest
-from unittest.mock import MagicMock, patch
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.testclient import TestClient
-from typing import List, Optional
-from pydantic import BaseModel
-
-
-# ---------------------------------------------------------------------------
-# Pydantic models (mirrors app.py so tests stay independent of the import)
-# ---------------------------------------------------------------------------
-
-class QueryRequest(BaseModel):
-    query: str
-    session_id: Optional[str] = None
-
-
-class QueryResponse(BaseModel):
-    answer: str
-    sources: List[str]
-    session_id: str
-
-
-class CourseStats(BaseModel):
-    total_courses: int
-    course_titles: List[str]
-
-
-# ---------------------------------------------------------------------------
-# Fixture: mock RAGSystem
-# ---------------------------------------------------------------------------
-
-@pytest.fixture
-def mock_rag_system():
-    """
-    A MagicMock that matches the RAGSystem interface used by the API routes.
-
-    Defaults:
-      - query()               → ("Mock answer", ["source1", "source2"])
-      - get_course_analytics() → {"total_courses": 2, "course_titles": [...]}
-      - session_manager.create_session() → "session_test"
-    """
-    rag = MagicMock()
-
-    rag.query.return_value = ("Mock answer", ["source1", "source2"])
-    rag.get_course_analytics.return_value = {
-        "total_courses": 2,
-        "course_titles": ["Python Basics", "Advanced ML"],
-    }
-    rag.session_manager.create_session.return_value = "session_test"
-
-    return rag
-
-
-# ---------------------------------------------------------------------------
-# Fixture: test FastAPI app (no static-file mount)
-# ---------------------------------------------------------------------------
-
-@pytest.fixture
-def test_app(mock_rag_system):
-    """
-    Minimal FastAPI app with the same routes as app.py, but without the
-    static-file mount so it works in a test environment without a frontend
-    build. The RAGSystem is replaced by mock_rag_system.
-    """
-    app = FastAPI(title="RAG System – Test App")
-
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
-
-    @app.post("/api/query", response_model=QueryResponse)
-    async def query_documents(request: QueryRequest):
-        try:
-            session_id = request.session_id
-            if not session_id:
-                session_id = mock_rag_system.session_manager.create_session()
-
-            answer, sources = mock_rag_system.query(request.query, session_id)
-
-            return QueryResponse(answer=answer, sources=sources, session_id=session_id)
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-
-    @app.get("/api/courses", response_model=CourseStats)
-    async def get_course_stats():
-        try:
-            analytics = mock_rag_system.get_course_analytics()
-            return CourseStats(
-                total_courses=analytics["total_courses"],
-                course_titles=analytics["course_titles"],
-            )
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=str(e))
-
-    return app
-
-
-# ---------------------------------------------------------------------------
-# Fixture: synchronous TestClient
-# ---------------------------------------------------------------------------
-
-@pytest.fixture
-def client(test_app):
-    """Synchronous HTTPX TestClient wrapping the test app."""
-    return TestClient(test_app)
-
-
-# ---------------------------------------------------------------------------
-# Fixture: sample course data
-# ---------------------------------------------------------------------------
-
-@pytest.fixture
-def sample_course_data():
-    """Reusable course analytics payload."""
-    return {
-        "total_courses": 2,
-        "course_titles": ["Python Basics", "Advanced ML"],
-    }
-
-
-# ---------------------------------------------------------------------------
-# Fixture: sample query / response payloads
-# ---------------------------------------------------------------------------
-
-@pytest.fixture
-def sample_query_payload():
-    """Valid /api/query request body."""
-    return {"query": "What is Python?"}
-
-
-@pytest.fixture
-def sample_query_response():
-    """Expected /api/query response body (matches mock_rag_system defaults)."""
-    return {
-        "answer": "Mock answer",
-        "sources": ["source1", "source2"],
-        "session_id": "session_test",
-    }
+"""
+Shared fixtures for the RAG chatbot test suite.
+
+The production app.py mounts StaticFiles from ../frontend at startup, which
+won't exist in the test environment. To avoid that import-time side effect we
+build a lightweight test app here that declares the same API routes and uses
+the same request/response models, but with a stub RAGSystem injected via
+dependency override.
+"""
+
+import json
+import httpx
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from types import MappingProxyType
+from typing import List, Optional
+from pydantic import BaseModel
+
+
+# ---------------------------------------------------------------------------
+# Pydantic models (mirrors app.py so tests stay independent of the import)
+# ---------------------------------------------------------------------------
+
+class QueryRequest(BaseModel):
+    query: str
+    session_id: Optional[str] = None
+
+
+class QueryResponse(BaseModel):
+    answer: str
+    sources: List[str]
+    session_id: str
+
+
+class CourseStats(BaseModel):
+    total_courses: int
+    course_titles: List[str]
+
+
+# ---------------------------------------------------------------------------
+# Fixture: mock RAGSystem
+# ---------------------------------------------------------------------------
+
+def get_rag_system():
+    """Route dependency; the session overrides it with mock_rag_system."""
+    raise RuntimeError("mock_rag_system is not installed")
+
+
+class _SessionStub:
+    """Stand-in for SessionManager that counts created sessions."""
+
+    def __init__(self):
+        self.created = 0
+
+    def create_session(self):
+        self.created += 1
+        return "session_test"
+
+
+class _RAGStub:
+    """
+    Hand-written stand-in for the RAGSystem interface used by the API routes.
+
+    Records (query, session_id) for every query/query_stream call in calls.
+    Set query_error, stream_error or analytics_error to an exception to make
+    the matching method raise it.
+    """
+
+    def __init__(self):
+        self.session_manager = _SessionStub()
+        self.reset()
+
+    def reset(self):
+        self.calls = []
+        self.query_error = None
+        self.stream_error = None
+        self.analytics_error = None
+        self.session_manager.created = 0
+
+    async def query(self, query, session_id=None):
+        self.calls.append((query, session_id))
+        if self.query_error:
+            raise self.query_error
+        return "Mock answer", ["source1", "source2"]
+
+    async def query_stream(self, query, session_id=None):
+        self.calls.append((query, session_id))
+        if self.stream_error:
+            raise self.stream_error
+        yield {"type": "delta", "text": "Mock "}
+        yield {"type": "delta", "text": "answer"}
+        yield {"type": "sources", "sources": ["source1", "source2"]}
+
+    def get_course_analytics(self):
+        if self.analytics_error:
+            raise self.analytics_error
+        return {
+            "total_courses": 2,
+            "course_titles": ["Python Basics", "Advanced ML"],
+        }
+
+
+@pytest.fixture(scope="session")
+def mock_rag_system(test_app):
+    """
+    A _RAGStub installed as the app's get_rag_system override.
+
+    Defaults:
+      - query() (async)       → ("Mock answer", ["source1", "source2"])
+      - query_stream()        → "Mock ", "answer" deltas, then the sources
+      - get_course_analytics() → {"total_courses": 2, "course_titles": [...]}
+      - session_manager.create_session() → "session_test"
+
+    Built once per session; _reset_mock_rag_system clears recorded calls and
+    injected errors after each test.
+    """
+    rag = _RAGStub()
+    test_app.dependency_overrides[get_rag_system] = lambda: rag
+    yield rag
+    test_app.dependency_overrides.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_mock_rag_system(mock_rag_system):
+    """Drop calls and per-test overrides so every test sees a pristine stub."""
+    yield
+    mock_rag_system.reset()
+
+
+# ---------------------------------------------------------------------------
+# Fixture: test FastAPI app (no static-file mount)
+# ---------------------------------------------------------------------------
+
+@pytest.fixture(scope="session")
+def test_app():
+    """
+    Minimal FastAPI app with the same routes as app.py, but without the
+    static-file mount so it works in a test environment without a frontend
+    build. Built once per session; routes resolve the current test's
+    mock_rag_system through the get_rag_system dependency override.
+    """
+    app = FastAPI(title="RAG System – Test App")
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    @app.post("/api/query", response_model=QueryResponse)
+    async def query_documents(request: QueryRequest, rag=Depends(get_rag_system)):
+        try:
+            session_id = request.session_id
+            if not session_id:
+                session_id = rag.session_manager.create_session()
+
+            answer, sources = await rag.query(request.query, session_id)
+
+            return QueryResponse(answer=answer, sources=sources, session_id=session_id)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    @app.post("/api/query/stream")
+    async def query_documents_stream(request: QueryRequest, rag=Depends(get_rag_system)):
+        session_id = request.session_id
+        if not session_id:
+            session_id = rag.session_manager.create_session()
+
+        async def event_stream():
+            events = rag.query_stream(request.query, session_id)
+            try:
+                async for event in events:
+                    yield f"data: {json.dumps(event)}\n\n"
+                yield f"data: {json.dumps({'type': 'done', 'session_id': session_id})}\n\n"
+            except Exception as e:
+                yield f"data: {json.dumps({'type': 'error', 'detail': str(e)})}\n\n"
+            finally:
+                await events.aclose()
+
+        return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+    @app.get("/api/courses", response_model=CourseStats)
+    async def get_course_stats(rag=Depends(get_rag_system)):
+        try:
+            analytics = rag.get_course_analytics()
+            return CourseStats(
+                total_courses=analytics["total_courses"],
+                course_titles=analytics["course_titles"],
+            )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=str(e))
+
+    return app
+
+
+# ---------------------------------------------------------------------------
+# Fixture: synchronous TestClient
+# ---------------------------------------------------------------------------
+
+@pytest.fixture(scope="session")
+def client(test_app, mock_rag_system):
+    """
+    Synchronous HTTPX TestClient wrapping the test app, shared by the whole
+    session. One warmup request per route is sent up front so routing and
+    model setup costs don't land on whichever test happens to run first.
+    """
+    with TestClient(test_app) as c:
+        c.get("/api/courses")
+        c.post("/api/query", json={"query": "warmup"})
+        mock_rag_system.reset()
+        yield c
+
+
+@pytest.fixture(scope="session")
+async def aclient(test_app):
+    """
+    httpx AsyncClient calling the test app's ASGI interface directly, without
+    TestClient's portal thread. Runs on the session-scoped event loop.
+    """
+    transport = httpx.ASGITransport(app=test_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
+
+
+# The injected errors below are cleared by _reset_mock_rag_system after the test.
+
+@pytest.fixture
+def broken_courses_client(client, mock_rag_system):
+    """The shared client, with RAGSystem.get_course_analytics raising for one test."""
+    mock_rag_system.analytics_error = RuntimeError("db error")
+    return client
+
+
+@pytest.fixture(scope="session")
+def error_client(test_app, mock_rag_system):
+    """
+    TestClient for error-path tests: returns 500 responses instead of
+    re-raising unhandled server exceptions into the test.
+    """
+    with TestClient(test_app, raise_server_exceptions=False) as c:
+        yield c
+
+
+@pytest.fixture
+def broken_query_client(error_client, mock_rag_system):
+    """error_client, with RAGSystem.query raising for one test."""
+    mock_rag_system.query_error = RuntimeError("rag failure")
+    return error_client
+
+
+# ---------------------------------------------------------------------------
+# Fixture: sample course data
+# ---------------------------------------------------------------------------
+
+# Sample data is shared by the whole session, so it is handed out read-only.
+
+@pytest.fixture(scope="session")
+def sample_course_data():
+    """Reusable course analytics payload."""
+    return MappingProxyType({
+        "total_courses": 2,
+        "course_titles": ["Python Basics", "Advanced ML"],
+    })
+
+
+# ---------------------------------------------------------------------------
+# Fixture: sample query / response payloads
+# ---------------------------------------------------------------------------
+
+@pytest.fixture(scope="session")
+def sample_query_payload():
+    """Valid /api/query request body."""
+    return MappingProxyType({"query": "What is Python?"})
+
+
+@pytest.fixture(scope="session")
+def sample_query_bytes(sample_query_payload):
+    """sample_query_payload serialized once, for posting with content=."""
+    return json.dumps(dict(sample_query_payload)).encode()
+
+
+@pytest.fixture(scope="session")
+def sample_query_response():
+    """Expected /api/query response body (matches mock_rag_system defaults)."""
+    return MappingProxyType({
+        "answer": "Mock answer",
+        "sources": ["source1", "source2"],
+        "session_id": "session_test",
+    })
+
+
+# ---------------------------------------------------------------------------
+# Fixture: happy-path response bodies
+# ---------------------------------------------------------------------------
+
+# Fetched once per session with the mock in its default state; tests that
+# only inspect the body share these instead of repeating the request.
+
+@pytest.fixture(scope="session")
+def happy_query_body(client, sample_query_bytes):
+    """Parsed body of a successful POST /api/query."""
+    return client.post(
+        "/api/query",
+        content=sample_query_bytes,
+        headers={"Content-Type": "application/json"},
+    ).json()
+
+
+@pytest.fixture(scope="session")
+def courses_body(client):
+    """Parsed body of a successful GET /api/courses."""
+    return client.get("/api/courses").json()
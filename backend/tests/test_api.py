@@ -1,208 +1,195 @@
-"""
-API endpoint tests for the RAG chatbot.
-
-Uses the test_app / client fixtures from conftest.py, which provide a
-static-file-free FastAPI app backed by a mocked RAGSystem.
-"""
-
-import pytest
-from unittest.mock import MagicMock
-
-
-# ===========================================================================
-# GET /api/courses
-# ===========================================================================
-
-class TestGetCourses:
-    """Tests for the GET /api/courses endpoint."""
-
-    def test_returns_200(self, client):
-        response = client.get("/api/courses")
-        assert response.status_code == 200
-
-    def test_response_shape(self, client, sample_course_data):
-        response = client.get("/api/courses")
-        body = response.json()
-
-        assert "total_courses" in body
-        assert "course_titles" in body
-
-    def test_response_values(self, client, sample_course_data):
-        response = client.get("/api/courses")
-        body = response.json()
-
-        assert body["total_courses"] == sample_course_data["total_courses"]
-        assert body["course_titles"] == sample_course_data["course_titles"]
-
-    def test_course_titles_is_list(self, client):
-        body = client.get("/api/courses").json()
-        assert isinstance(body["course_titles"], list)
-
-    def test_total_courses_is_int(self, client):
-        body = client.get("/api/courses").json()
-        assert isinstance(body["total_courses"], int)
-
-    def test_internal_error_returns_500(self, test_app):
-        """When RAGSystem raises, the endpoint should return 500."""
-        # Patch the route's rag reference via a fresh client with a broken mock
-        from fastapi.testclient import TestClient
-
-        # Re-wire: get the mock out of the app's route closures by building a
-        # new test_app whose rag raises.
-        broken_rag = MagicMock()
-        broken_rag.get_course_analytics.side_effect = RuntimeError("db error")
-
-        from fastapi import FastAPI, HTTPException
-        from fastapi.responses import JSONResponse
-
-        mini = FastAPI()
-
-        @mini.get("/api/courses")
-        async def _courses():
-            try:
-                broken_rag.get_course_analytics()
-            except Exception as e:
-                raise HTTPException(status_code=500, detail=str(e))
-
-        resp = TestClient(mini).get("/api/courses")
-        assert resp.status_code == 500
-        assert "db error" in resp.json()["detail"]
-
-
-# ===========================================================================
-# POST /api/query
-# ===========================================================================
-
-class TestPostQuery:
-    """Tests for the POST /api/query endpoint."""
-
-    # --- happy-path ---
-
-    def test_returns_200(self, client, sample_query_payload):
-        response = client.post("/api/query", json=sample_query_payload)
-        assert response.status_code == 200
-
-    def test_response_contains_required_fields(self, client, sample_query_payload):
-        body = client.post("/api/query", json=sample_query_payload).json()
-
-        assert "answer" in body
-        assert "sources" in body
-        assert "session_id" in body
-
-    def test_answer_is_string(self, client, sample_query_payload):
-        body = client.post("/api/query", json=sample_query_payload).json()
-        assert isinstance(body["answer"], str)
-
-    def test_sources_is_list(self, client, sample_query_payload):
-        body = client.post("/api/query", json=sample_query_payload).json()
-        assert isinstance(body["sources"], list)
-
-    def test_session_id_is_string(self, client, sample_query_payload):
-        body = client.post("/api/query", json=sample_query_payload).json()
-        assert isinstance(body["session_id"], str)
-
-    def test_response_values_match_mock(self, client, sample_query_payload, sample_query_response):
-        body = client.post("/api/query", json=sample_query_payload).json()
-
-        assert body["answer"] == sample_query_response["answer"]
-        assert body["sources"] == sample_query_response["sources"]
-        assert body["session_id"] == sample_query_response["session_id"]
-
-    # --- session handling ---
-
-    def test_new_session_created_when_none_provided(self, client, mock_rag_system):
-        """Without a session_id the endpoint creates one via session_manager."""
-        response = client.post("/api/query", json={"query": "hello"})
-        assert response.status_code == 200
-        # The mock session_manager should have been called to create a session
-        mock_rag_system.session_manager.create_session.assert_called_once()
-
-    def test_provided_session_id_is_reused(self, client, mock_rag_system):
-        """When session_id is supplied it must be passed through unchanged."""
-        payload = {"query": "hello", "session_id": "my-session-123"}
-        body = client.post("/api/query", json=payload).json()
-
-        assert body["session_id"] == "my-session-123"
-        # create_session should NOT have been called
-        mock_rag_system.session_manager.create_session.assert_not_called()
-
-    def test_rag_query_called_with_correct_args(self, client, mock_rag_system):
-        """The underlying RAGSystem.query must receive the user query text."""
-        payload = {"query": "What is machine learning?", "session_id": "s1"}
-        client.post("/api/query", json=payload)
-
-        mock_rag_system.query.assert_called_once_with(
-            "What is machine learning?", "s1"
-        )
-
-    # --- validation ---
-
-    def test_missing_query_field_returns_422(self, client):
-        """A request body without 'query' should fail Pydantic validation."""
-        response = client.post("/api/query", json={})
-        assert response.status_code == 422
-
-    def test_empty_query_string_is_accepted(self, client):
-        """An empty string is a valid (if unusual) query value."""
-        response = client.post("/api/query", json={"query": ""})
-        assert response.status_code == 200
-
-    def test_extra_fields_are_ignored(self, client):
-        """Unknown fields in the request body should not cause errors."""
-        payload = {"query": "hello", "unknown_field": "value"}
-        response = client.post("/api/query", json=payload)
-        assert response.status_code == 200
-
-    def test_non_json_body_returns_422(self, client):
-        response = client.post(
-            "/api/query",
-            content=b"not json",
-            headers={"Content-Type": "application/json"},
-        )
-        assert response.status_code == 422
-
-    # --- error handling ---
-
-    def test_internal_error_returns_500(self, test_app, mock_rag_system):
-        """When RAGSystem.query raises, the endpoint should return 500."""
-        mock_rag_system.query.side_effect = RuntimeError("rag failure")
-
-        from fastapi.testclient import TestClient
-
-        response = TestClient(test_app).post(
-            "/api/query", json={"query": "trigger error"}
-        )
-        assert response.status_code == 500
-        assert "rag failure" in response.json()["detail"]
-
-
-# ===========================================================================
-# Content-type / headers
-# ===========================================================================
-
-class TestResponseHeaders:
-    """Verify that responses carry the expected Content-Type."""
-
-    def test_courses_content_type_is_json(self, client):
-        response = client.get("/api/courses")
-        assert "application/json" in response.headers["content-type"]
-
-    def test_query_content_type_is_json(self, client):
-        response = client.post("/api/query", json={"query": "hi"})
-        assert "application/json" in response.headers["content-type"]
-
-
-# ===========================================================================
-# Method-not-allowed guards
-# ===========================================================================
-
-class TestMethodNotAllowed:
-    """Ensure wrong HTTP methods return 405."""
-
-    def test_get_on_query_endpoint(self, client):
-        response = client.get("/api/query")
-        assert response.status_code == 405
-
-    def test_post_on_courses_endpoint(self, client):
-        response = client.post("/api/courses", json={})
-        assert response.status_code == 405
+"""
+API endpoint tests for the RAG chatbot.
+
+Uses the test_app / client / aclient fixtures from conftest.py, which provide
+a static-file-free FastAPI app backed by a stub RAGSystem. Happy-path checks
+go through aclient (direct ASGI calls); the rest use the sync TestClient.
+"""
+
+import json
+import pytest
+
+# Keep the API tests on one worker so the session-scoped app and client are
+# built once.
+pytestmark = pytest.mark.xdist_group(name="api")
+
+_EXPECTED_QUERY_CALL = ("What is machine learning?", "s1")
+
+
+def _status(client, method, path, **kwargs):
+    """Return just the status code, without reading the response body."""
+    with client.stream(method, path, **kwargs) as response:
+        return response.status_code
+
+
+# ===========================================================================
+# GET /api/courses
+# ===========================================================================
+
+class TestGetCourses:
+    """Tests for the GET /api/courses endpoint."""
+
+    async def test_returns_200(self, aclient):
+        response = await aclient.get("/api/courses")
+        assert response.status_code == 200
+
+    def test_response_shape(self, courses_body):
+        assert courses_body.keys() == {"total_courses", "course_titles"}
+
+    def test_response_values(self, courses_body, sample_course_data):
+        assert courses_body["total_courses"] == sample_course_data["total_courses"]
+        assert courses_body["course_titles"] == sample_course_data["course_titles"]
+
+    @pytest.mark.parametrize("field,typ", [("total_courses", int), ("course_titles", list)])
+    def test_field_type(self, courses_body, field, typ):
+        assert isinstance(courses_body[field], typ)
+
+    def test_internal_error_returns_500(self, broken_courses_client):
+        """When RAGSystem raises, the endpoint should return 500."""
+        resp = broken_courses_client.get("/api/courses")
+        assert resp.status_code == 500
+        assert "db error" in resp.json()["detail"]
+
+
+# ===========================================================================
+# POST /api/query
+# ===========================================================================
+
+class TestPostQuery:
+    """Tests for the POST /api/query endpoint."""
+
+    # --- happy-path ---
+
+    async def test_returns_200(self, aclient, sample_query_bytes):
+        response = await aclient.post(
+            "/api/query",
+            content=sample_query_bytes,
+            headers={"Content-Type": "application/json"},
+        )
+        assert response.status_code == 200
+
+    def test_response_contains_required_fields(self, happy_query_body):
+        assert happy_query_body.keys() == {"answer", "sources", "session_id"}
+
+    @pytest.mark.parametrize("field,typ", [("answer", str), ("sources", list), ("session_id", str)])
+    def test_field_type(self, happy_query_body, field, typ):
+        assert isinstance(happy_query_body[field], typ)
+
+    def test_response_values_match_mock(self, happy_query_body, sample_query_response):
+        assert happy_query_body["answer"] == sample_query_response["answer"]
+        assert happy_query_body["sources"] == sample_query_response["sources"]
+        assert happy_query_body["session_id"] == sample_query_response["session_id"]
+
+    # --- session handling ---
+
+    async def test_new_session_created_when_none_provided(self, aclient, mock_rag_system):
+        """Without a session_id the endpoint creates one via session_manager."""
+        response = await aclient.post("/api/query", json={"query": "hello"})
+        assert response.status_code == 200
+        # The stub session_manager should have been asked to create a session
+        assert mock_rag_system.session_manager.created == 1
+
+    async def test_provided_session_id_is_reused(self, aclient, mock_rag_system):
+        """When session_id is supplied it must be passed through unchanged."""
+        payload = {"query": "hello", "session_id": "my-session-123"}
+        body = (await aclient.post("/api/query", json=payload)).json()
+
+        assert body["session_id"] == "my-session-123"
+        # create_session should NOT have been called
+        assert mock_rag_system.session_manager.created == 0
+
+    async def test_rag_query_called_with_correct_args(self, aclient, mock_rag_system):
+        """The underlying RAGSystem.query must receive the user query text."""
+        query, session_id = _EXPECTED_QUERY_CALL
+        await aclient.post("/api/query", json={"query": query, "session_id": session_id})
+
+        assert mock_rag_system.calls == [_EXPECTED_QUERY_CALL]
+
+    # --- validation ---
+
+    @pytest.mark.parametrize("kwargs,expected", [
+        ({"json": {}}, 422),
+        ({"json": {"query": ""}}, 200),
+        ({"json": {"query": "hello", "unknown_field": "value"}}, 200),
+        ({"content": b"not json", "headers": {"Content-Type": "application/json"}}, 422),
+    ], ids=["missing-query", "empty-query-accepted", "extra-fields-ignored", "non-json-body"])
+    def test_query_validation(self, client, kwargs, expected):
+        """Request bodies are validated by Pydantic; unknown fields are ignored."""
+        assert _status(client, "POST", "/api/query", **kwargs) == expected
+
+    # --- error handling ---
+
+    def test_internal_error_returns_500(self, broken_query_client):
+        """When RAGSystem.query raises, the endpoint should return 500."""
+        response = broken_query_client.post(
+            "/api/query", json={"query": "trigger error"}
+        )
+        assert response.status_code == 500
+        assert "rag failure" in response.json()["detail"]
+
+
+# ===========================================================================
+# POST /api/query/stream
+# ===========================================================================
+
+def _sse_events(response):
+    return [
+        json.loads(line[len("data: "):])
+        for line in response.text.splitlines()
+        if line.startswith("data: ")
+    ]
+
+
+class TestPostQueryStream:
+    """Tests for the POST /api/query/stream server-sent events endpoint."""
+
+    def test_streams_deltas_sources_and_done(self, client):
+        response = client.post("/api/query/stream", json={"query": "hi", "session_id": "s1"})
+
+        assert response.status_code == 200
+        assert "text/event-stream" in response.headers["content-type"]
+        assert _sse_events(response) == [
+            {"type": "delta", "text": "Mock "},
+            {"type": "delta", "text": "answer"},
+            {"type": "sources", "sources": ["source1", "source2"]},
+            {"type": "done", "session_id": "s1"},
+        ]
+
+    def test_new_session_created_when_none_provided(self, client, mock_rag_system):
+        response = client.post("/api/query/stream", json={"query": "hi"})
+
+        assert mock_rag_system.session_manager.created == 1
+        assert _sse_events(response)[-1] == {"type": "done", "session_id": "session_test"}
+
+    def test_error_reported_as_event(self, client, mock_rag_system):
+        mock_rag_system.stream_error = RuntimeError("stream failure")
+
+        response = client.post("/api/query/stream", json={"query": "hi"})
+
+        assert _sse_events(response) == [{"type": "error", "detail": "stream failure"}]
+
+
+# ===========================================================================
+# Content-type / headers
+# ===========================================================================
+
+class TestResponseHeaders:
+    """Verify that responses carry the expected Content-Type."""
+
+    @pytest.mark.parametrize("method,path", [("GET", "/api/courses"), ("POST", "/api/query")])
+    def test_content_type_is_json(self, client, method, path):
+        response = client.request(method, path, json={"query": "hi"} if method == "POST" else None)
+        assert response.status_code == 200
+        assert "application/json" in response.headers["content-type"]
+
+
+# ===========================================================================
+# Method-not-allowed guards
+# ===========================================================================
+
+class TestMethodNotAllowed:
+    """Ensure wrong HTTP methods return 405."""
+
+    @pytest.mark.parametrize("method,path", [("GET", "/api/query"), ("POST", "/api/courses")])
+    def test_wrong_method_returns_405(self, client, method, path):
+        assert _status(client, method, path, json={} if method == "POST" else None) == 405